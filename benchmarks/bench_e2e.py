@@ -0,0 +1,531 @@
+"""End-to-end replay of updates through the real handlers, with no Telegram, jw.org or production database.
+
+python -m benchmarks.bench_e2e
+python -m benchmarks.bench_e2e --count 5000 --users 200 --workers 16 --latency 0.08 --passes 3
+python -m benchmarks.bench_e2e --record updates.jsonl   # save the generated mix, fake_telegram replays it too
+python -m benchmarks.bench_e2e --updates updates.jsonl  # replay recorded updates
+
+Only the edges of the process are replaced. Everything between them is the bot's own code:
+- Telegram: an ExtBot whose RecordingRequest answers every method as the Bot API does. Each answer takes
+  --latency seconds, and every call is counted.
+- jw.org, pubmedia and the epub CDN: a local HTTP server mounted on browser.session. It serves the pubmedia of
+  Psalms and John in ASL and a generated English epub.
+- database: a temporary SQLite file with English and ASL. Psalms is already fetched, and some of its verses
+  have a File, as if they had been sent before. John is not fetched yet, so its first citation goes the cold
+  way through pubmedia.
+- ffmpeg and ffprobe are only counted. Verses without a File need them. The default mix asks for cached verses,
+  and --uncached asks for other ones. Without ffmpeg installed, those updates end in error_handler.
+
+The first pass starts with empty caches: John's pubmedia, keyboards, inline results and user sessions. The epub
+is missing too, so verses go without their text and the language is queued. After each pass the warmer job
+downloads and indexes the queued epubs, as the JobQueue would. Later passes replay the same updates warm.
+"""
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from queue import Queue
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+from zipfile import ZipFile
+
+import numpy as np
+from requests.adapters import HTTPAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.sql import text
+from telegram import Update
+from telegram import User as TelegramUser
+from telegram.ext import ExtBot
+from telegram.utils.request import Request
+
+from benchmarks.bench_pubmedia import PSALMS_VERSES
+from benchmarks.fake_telegram import recorded_updates
+from bot.database import fetch
+from bot.database import session
+from bot.database.schema import Base
+from bot.database.schema import Bible
+from bot.database.schema import Book
+from bot.database.schema import BookAvailability
+from bot.database.schema import Chapter
+from bot.database.schema import Edition
+from bot.database.schema import File
+from bot.database.schema import Language
+from bot.database.schema import LanguageName
+from bot.database.schema import User
+from bot.database.views import views
+from bot.dispatcher import KeyedDispatcher
+from bot.handlers import handlers
+from bot.handlers import error_handler
+from bot.jobs import warm_queued_epubs
+from bot.utils import dt_now
+from bot.utils import video
+from bot.utils.browser import browser
+
+
+MEPS_SYMBOL, SIGN_MEPS_SYMBOL = 'E', 'ASL'
+JOHN_VERSES = [51, 25, 36, 54, 47, 71, 52, 59, 41, 42, 57, 50, 38, 31, 27, 33, 26, 40, 42, 31, 25]
+BOOKS = { # booknum: (name, abbreviation, verses per chapter)
+    19: ('Psalms', 'Ps', PSALMS_VERSES),
+    43: ('John', 'Joh', JOHN_VERSES),
+}
+FETCHED = [19] # books whose pubmedia is in the fixture db, the others are fetched by the first citation
+CACHED = {(19, 23): ['1', '2', '3', '4', '5', '6', '1 2 3'], (19, 117): ['1', '2'], (19, 1): ['1']} # raw_verses with a File
+MARKER_SECONDS = 12
+VIDEO_SECONDS = 60
+FIRST_USER_ID = 10_000
+BOT = TelegramUser(123456, 'Bench', is_bot=True, username='bench_bot')
+EPUB_URL = f'https://download-a.akamaihd.net/files/media_publication/nwt_{MEPS_SYMBOL}.epub'
+
+MIX = [ # (kind, payload) every user goes through, each one starting at a different step
+    ('message', 'Psalms 23:1'),
+    ('callback', 'B|ase|19'),
+    ('callback', 'C|ase|19|23'),
+    ('callback', 'V|ase|19|23|5'),
+    ('inline', 'Ps 23:1'),
+    ('message', 'Psalms 23:1-3'),
+    ('message', 'John 3'),
+    ('message', 'Ps 117:2'),
+    ('inline', ''),
+    ('message', 'Psalms 23'),
+    ('message', 'Psalms 1:1'),
+    ('message', 'Psalms'),
+]
+UNCACHED = [ # verses without a File, they need ffmpeg
+    ('message', 'Psalms 3:2'),
+    ('message', 'John 3:16'),
+    ('callback', 'V|ase|19|117|1'),
+]
+
+
+def pubmedia(meps_symbol: str, booknum: int, video_url: str | None) -> dict:
+    """GETPUBMEDIALINKS of a whole book, a marker per verse"""
+    def doc(chapternumber: int, verses: int, quality: str) -> dict:
+        url = f'https://download-a.akamaihd.net/files/media_publication/nwt_{meps_symbol}_{booknum:02}_{chapternumber:03}_r{quality}.mp4'
+        return {
+            'title': f'{BOOKS[booknum][0]} {chapternumber}',
+            'track': chapternumber,
+            'label': quality,
+            'file': {
+                'url': video_url or url,
+                'checksum': f'{booknum:02}{chapternumber:03}{quality}'.ljust(32, '0'),
+                'modifiedDatetime': '2023-05-02 12:00:00',
+            },
+            'markers': {'markers': [
+                {
+                    'verseNumber': verse,
+                    'label': f'{BOOKS[booknum][1]} {chapternumber}:{verse}',
+                    'duration': f'00:00:{MARKER_SECONDS:02}.000',
+                    'startTime': f'00:00:{(verse - 1) * MARKER_SECONDS % VIDEO_SECONDS:02}.000',
+                    'endTransitionDuration': '00:00:00.500',
+                } for verse in range(1, verses + 1)
+            ]},
+        }
+    return {'files': {meps_symbol: {
+        fmt: [doc(chapternumber, verses, quality)
+              for chapternumber, verses in enumerate(BOOKS[booknum][2], start=1)
+              for quality in ('240p', '720p')]
+        for fmt in ('MP4', 'M4V')
+    }}}
+
+
+def epub() -> bytes:
+    """nwt epub with what the bot reads: a versenav and a chapter xhtml of every chapter of BOOKS"""
+    def chapter(booknum: int, chapternum: int, verses: int) -> str:
+        sw = '<p class="sw">A melody of David.</p>' if booknum == 19 else ''
+        paragraphs = ''.join(
+            f'<p class="sb"><span id="chapter{chapternum}_verse{verse}"></span>'
+            f'<strong>{chapternum if verse == 1 else f"<sup>{verse}</sup>"}</strong>'
+            f'&#160;Text of {BOOKS[booknum][0]} {chapternum}:{verse}, about as long as a verse usually is.</p>'
+            for verse in range(1, verses + 1)
+        )
+        return f'<?xml version="1.0" encoding="utf-8"?><html><body>{sw}{paragraphs}</body></html>'
+
+    buffer = io.BytesIO()
+    with ZipFile(buffer, 'w') as z:
+        z.writestr('mimetype', 'application/epub+zip')
+        for booknum, (_, _, chapters) in BOOKS.items():
+            for chapternum, verses in enumerate(chapters, start=1):
+                name = f'{booknum:02}{chapternum:03}-split{chapternum}.xhtml'
+                z.writestr(f'OEBPS/bibleversenav{booknum}_{chapternum}.xhtml',
+                           f'<html><body><table><tr><td><a href="{name}#chapter{chapternum}_verse1">1</a>'
+                           f'</td></tr></table></body></html>')
+                z.writestr(f'OEBPS/{name}', chapter(booknum, chapternum, verses))
+    return buffer.getvalue()
+
+
+class StandIn(ThreadingHTTPServer):
+    """Local server of the jw.org responses. Requests arrive as /{host}{path}?{query}"""
+    daemon_threads = True
+
+    def __init__(self, video_url: str | None):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.epub = epub()
+        self.pubmedia = {(SIGN_MEPS_SYMBOL, str(booknum)): json.dumps(pubmedia(SIGN_MEPS_SYMBOL, booknum, video_url))
+                         for booknum in BOOKS}
+        self.pubmedia_epub = json.dumps({'files': {MEPS_SYMBOL: {'EPUB': [{'file': {
+            'url': EPUB_URL,
+            'checksum': hashlib.md5(self.epub).hexdigest(),
+            'modifiedDatetime': '2023-05-02 12:00:00',
+        }}]}}})
+        self.hits = Counter()
+        self._lock = threading.Lock()
+
+    def route(self, url: str) -> tuple[str, str, bytes] | None:
+        """(route name, content type, body) or None if it is not something the fixture has"""
+        parts = urlsplit(url)
+        host, _, path = parts.path.lstrip('/').partition('/')
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        if f'{host}/{path}' in ('b.jw-cdn.org/apis/pub-media/GETPUBMEDIALINKS', 'pubmedia.jw-api.org/GETPUBMEDIALINKS'):
+            if query.get('fileformat') == 'EPUB' and query.get('langwritten') == MEPS_SYMBOL:
+                return f'pubmedia EPUB {MEPS_SYMBOL}', 'application/json', self.pubmedia_epub.encode()
+            if (body := self.pubmedia.get((query.get('langwritten'), query.get('booknum')))):
+                return f'pubmedia {query["langwritten"]} {query["booknum"]}', 'application/json', body.encode()
+        if f'https://{host}/{path}' == EPUB_URL:
+            return 'epub', 'application/epub+zip', self.epub
+        return None
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.hits[name] += 1
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: StandIn
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        if not (route := self.server.route(self.path)):
+            self.server.count(f'404 {self.path.split("?")[0]}')
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        name, content_type, body = route
+        self.server.count(name)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None: # pylint: disable=redefined-builtin
+        pass
+
+
+class StandInAdapter(HTTPAdapter):
+    """Send every request of the session to the StandIn instead of its host"""
+    def __init__(self, origin: str):
+        super().__init__(pool_maxsize=32)
+        self.origin = origin
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = f'{self.origin}/{parts.netloc}{parts.path}' + (f'?{parts.query}' if parts.query else '')
+        return super().send(request, **kwargs)
+
+
+class RecordingRequest(Request):
+    """Answer every Bot API method the way Telegram does, after latency seconds. Nothing leaves the process"""
+    __slots__ = ('latency', 'calls', '_ids', '_lock')
+
+    def __init__(self, latency: float):
+        super().__init__(con_pool_size=1)
+        self.latency = latency
+        self.calls = Counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _record(self, method: str) -> int:
+        with self._lock:
+            self.calls[method] += 1
+            return next(self._ids)
+
+    def post(self, url: str, data: dict | None = None, timeout: float | None = None) -> dict | bool:
+        method = url.rsplit('/', 1)[1]
+        result = answer(method, data or {}, self._record(method))
+        time.sleep(self.latency)
+        return result
+
+    def retrieve(self, url: str, timeout: float | None = None) -> bytes:
+        self._record('retrieve')
+        time.sleep(self.latency)
+        return b''
+
+    def download(self, url: str, filename: str, timeout: float | None = None) -> None:
+        self._record('download')
+        time.sleep(self.latency)
+        Path(filename).write_bytes(b'')
+
+
+def answer(method: str, data: dict, message_id: int) -> dict | bool:
+    """Result of a Bot API method, with what the handlers read of it"""
+    if method == 'getMe':
+        return BOT.to_dict()
+    if method == 'copyMessage':
+        return {'message_id': message_id}
+    if method == 'getFile':
+        return {'file_id': data['file_id'], 'file_unique_id': f'u{data["file_id"]}', 'file_size': 0,
+                'file_path': f'videos/{data["file_id"]}.mp4'}
+    if method == 'sendChatAction' or not method.startswith(('send', 'forward', 'edit')):
+        return True
+    chat_id = data.get('chat_id')
+    message = {'message_id': message_id, 'date': int(time.time()), 'from': BOT.to_dict(),
+               'chat': {'id': chat_id if isinstance(chat_id, int) else 0, 'type': 'private'}}
+    if isinstance(data.get('text'), str):
+        message['text'] = data['text']
+    if method == 'sendVideo':
+        message['video'] = {'file_id': f'video{message_id}', 'file_unique_id': f'uvideo{message_id}',
+                            'width': data.get('width') or 1280, 'height': data.get('height') or 720,
+                            'duration': data.get('duration') or MARKER_SECONDS, 'file_size': 1_000_000}
+    if method == 'sendDocument':
+        message['document'] = {'file_id': f'document{message_id}', 'file_unique_id': f'udocument{message_id}'}
+    return message
+
+
+class ProcessCounter:
+    """Count the ffmpeg and ffprobe processes of the modules that run them. They still run"""
+    def __init__(self, *modules):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        for module in modules:
+            module.run = self.wrap(module.run)
+
+    def wrap(self, run):
+        @wraps(run)
+        def counted(args, *a, **kw):
+            with self._lock:
+                self.counts[Path(args[0]).name] += 1
+            return run(args, *a, **kw)
+        return counted
+
+
+class HandlerTimer:
+    """Seconds of each handler callback and exceptions that reached error_handler"""
+    def __init__(self):
+        self.durations: dict[str, list[float]] = {}
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def wrap(self, callback):
+        @wraps(callback)
+        def timed(update, context):
+            t0 = time.perf_counter()
+            try:
+                return callback(update, context)
+            finally:
+                with self._lock:
+                    self.durations.setdefault(callback.__name__, []).append(time.perf_counter() - t0)
+        return timed
+
+    def wrap_error_handler(self, callback):
+        @wraps(callback)
+        def counted(update, context):
+            with self._lock:
+                self.errors[type(context.error).__name__] += 1
+            return callback(update, context)
+        return counted
+
+    def reset(self) -> None:
+        with self._lock:
+            self.durations, self.errors = {}, Counter()
+
+
+def chapter_video(path: Path) -> str | None:
+    """Local chapter video that ffmpeg can cut, if ffmpeg is installed"""
+    if not shutil.which('ffmpeg'):
+        return None
+    subprocess.run(['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc=size=640x360:rate=25',
+                    '-f', 'lavfi', '-i', 'anullsrc', '-t', str(VIDEO_SECONDS), '-c:v', 'libx264',
+                    '-preset', 'ultrafast', '-c:a', 'aac', '-shortest', str(path)], check=True)
+    return str(path.absolute())
+
+
+def fixture_database(path: Path, users: int, stand_in: StandIn) -> None:
+    """Point the bot session to a new database with the languages, books, users and files of the benchmark"""
+    engine = create_engine(f'sqlite:///{path}', echo=False, connect_args={'timeout': 30})
+    Base.metadata.create_all(engine)
+    with engine.connect() as con:
+        for view in views:
+            con.execute(text(view))
+    session.remove()
+    session.configure(bind=engine)
+    Base.metadata.bind = engine
+
+    session.bulk_insert_mappings(Bible, [
+        dict(book=booknum, chapter=chapternum, verse=verse, is_omitted=False)
+        for booknum, (_, _, chapters) in BOOKS.items()
+        for chapternum, verses in enumerate(chapters, start=1)
+        for verse in range(1, verses + 1)
+    ])
+    session.add_all([
+        Language(code='en', meps_symbol=MEPS_SYMBOL, name='English', vernacular='English', is_sign_language=False,
+                 script='ROMAN', rsconf='r1', lib='lp-e'),
+        Language(code='ase', meps_symbol=SIGN_MEPS_SYMBOL, name='American Sign Language', vernacular='ASL',
+                 is_sign_language=True, script='ROMAN', rsconf='r266', lib='lp-asl'),
+        LanguageName(language_code='ase', in_language_code='en', name='American Sign Language'),
+        LanguageName(language_code='en', in_language_code='en', name='English'),
+        Edition(id=1, language_code='en', symbol='nwt', name='New World Translation'),
+        Edition(id=2, language_code='ase', symbol='nwt', name='New World Translation'),
+        BookAvailability(language_code='ase', raw_booknums=' '.join(map(str, BOOKS)), refreshed=dt_now(naive=True)),
+    ])
+    for edition_id in (1, 2):
+        session.add_all([Book(edition_id=edition_id, number=booknum, name=name, standard_abbreviation=abbreviation,
+                              official_abbreviation=abbreviation, standard_singular_bookname=name)
+                         for booknum, (name, abbreviation, _) in BOOKS.items()])
+    session.add_all([User(telegram_user_id=FIRST_USER_ID + i, first_name=f'User {i}', bot_language_code='en',
+                          sign_language_code='ase', status=User.AUTHORIZED, added_datetime=dt_now())
+                     for i in range(users)])
+    session.commit()
+
+    for booknum in FETCHED:
+        book = session.query(Book).filter(Book.edition_id == 2, Book.number == booknum).one()
+        data = json.loads(stand_in.pubmedia[(SIGN_MEPS_SYMBOL, str(booknum))])
+        fetch.store_pubmedia(book, fetch.pubmedia_docs(data['files'][SIGN_MEPS_SYMBOL]))
+        book.refreshed = dt_now()
+    chapters = {(chapter.book.number, chapter.number): chapter.id for chapter in session.query(Chapter)}
+    session.add_all([File(chapter_id=chapters[key], telegram_file_id=f'file{i}', telegram_file_unique_id=f'ufile{i}',
+                          size=1_000_000, duration=MARKER_SECONDS * len(raw_verses.split()),
+                          citation=f'{BOOKS[key[0]][0]} {key[1]}:{raw_verses}', raw_verses=raw_verses,
+                          count_verses=len(raw_verses.split()), added_datetime=dt_now(), is_deprecated=False,
+                          delogo=False)
+                     for i, (key, raw_verses) in enumerate((key, raw_verses) for key, all_raw_verses in CACHED.items()
+                                                           for raw_verses in all_raw_verses)])
+    session.commit()
+    session.remove()
+
+
+def generated_updates(count: int, users: int, uncached: float, seed: int = 0) -> list[dict]:
+    """Users take turns. Each one goes through MIX from its own step, a fraction uncached asks other verses"""
+    rnd = random.Random(seed)
+    now = int(time.time())
+    updates = []
+    for update_id in range(1, count + 1):
+        user = (update_id - 1) % users
+        tuser = {'id': FIRST_USER_ID + user, 'is_bot': False, 'first_name': f'User {user}', 'language_code': 'en'}
+        chat = {'id': FIRST_USER_ID + user, 'type': 'private', 'first_name': f'User {user}'}
+        step = (update_id - 1) // users + user
+        kind, payload = rnd.choice(UNCACHED) if rnd.random() < uncached else MIX[step % len(MIX)]
+        if kind == 'message':
+            updates.append({'update_id': update_id, 'message': {
+                'message_id': update_id, 'date': now, 'chat': chat, 'from': tuser, 'text': payload}})
+        elif kind == 'callback':
+            updates.append({'update_id': update_id, 'callback_query': {
+                'id': str(update_id), 'from': tuser, 'chat_instance': str(chat['id']), 'data': payload,
+                'message': {'message_id': update_id, 'date': now, 'chat': chat, 'from': BOT.to_dict(), 'text': '👋🏼'}}})
+        else:
+            updates.append({'update_id': update_id, 'inline_query': {
+                'id': str(update_id), 'from': tuser, 'query': payload, 'offset': ''}})
+    return updates
+
+
+def replay(bot: ExtBot, updates: list[dict], workers: int, on_error) -> float:
+    """Seconds until every update is processed by a new KeyedDispatcher with the bot handlers"""
+    dispatcher = KeyedDispatcher(bot, Queue(), workers=workers)
+    for handler in handlers:
+        dispatcher.add_handler(handler)
+    dispatcher.add_error_handler(on_error)
+    t0 = time.perf_counter()
+    for data in updates:
+        dispatcher.process_update(Update.de_json(data, bot))
+    dispatcher.executor.shutdown(wait=True)
+    return time.perf_counter() - t0
+
+
+def percentiles_ms(durations: list[float]) -> dict[str, float]:
+    return {f'p{p}': round(v * 1000, 1) for p, v in zip((50, 95, 99), np.percentile(durations, (50, 95, 99)))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=Path, help='jsonl of recorded updates, instead of the generated mix')
+    parser.add_argument('--record', type=Path, help='write the updates to replay to this jsonl')
+    parser.add_argument('--count', type=int, default=1000, help='generated updates')
+    parser.add_argument('--users', type=int, default=50, help='users of the fixture db and of the generated updates')
+    parser.add_argument('--uncached', type=float, default=0.0, help='fraction of generated updates asking verses '
+                                                                    'without a File, they run ffmpeg')
+    parser.add_argument('--workers', type=int, default=8, help='workers of the dispatcher')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds telegram takes to answer each call')
+    parser.add_argument('--passes', type=int, default=2, help='first one cold, the rest warm')
+    parser.add_argument('--json', type=Path, help='write the results of every pass to this file')
+    args = parser.parse_args()
+
+    updates = recorded_updates(args.updates) if args.updates else \
+        generated_updates(args.count, args.users, args.uncached)
+    if args.record:
+        args.record.write_text(''.join(json.dumps(update, ensure_ascii=False) + '\n' for update in updates))
+
+    timer = HandlerTimer()
+    for handler in handlers:
+        if hasattr(handler, 'callback'): # ConversationHandler has none, its states are not in the mix
+            handler.callback = timer.wrap(handler.callback)
+    on_error = timer.wrap_error_handler(error_handler)
+    processes = ProcessCounter(video, fetch)
+    request = RecordingRequest(args.latency)
+    bot = ExtBot('123456:bench', request=request)
+    bot._bot = BOT # what get_me would answer
+
+    cwd = os.getcwd()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp) # epub and videos are written relative to the working directory
+        Path('bible-epub').mkdir()
+        stand_in = StandIn(chapter_video(Path(tmp) / 'chapter.mp4'))
+        threading.Thread(target=stand_in.serve_forever, daemon=True).start()
+        adapters = browser.session.adapters.copy()
+        adapter = StandInAdapter(f'http://127.0.0.1:{stand_in.server_address[1]}')
+        browser.session.mount('https://', adapter)
+        browser.session.mount('http://', adapter)
+        try:
+            fixture_database(Path(tmp) / 'database.db', args.users, stand_in)
+            print(f'{len(updates)} updates, {args.workers} workers, {args.latency * 1000:.0f} ms of telegram latency')
+            for n in range(1, args.passes + 1):
+                timer.reset()
+                calls, hits, counts = request.calls.copy(), stand_in.hits.copy(), processes.counts.copy()
+                elapsed = replay(bot, updates, args.workers, on_error)
+                warm_queued_epubs(None)
+                result = dict(
+                    run=n,
+                    warm=n > 1,
+                    updates=len(updates),
+                    seconds=round(elapsed, 3),
+                    updates_per_second=round(len(updates) / elapsed, 1),
+                    handlers={name: dict(count=len(durations), **percentiles_ms(durations))
+                              for name, durations in sorted(timer.durations.items())},
+                    telegram=dict(request.calls - calls),
+                    http=dict(stand_in.hits - hits),
+                    processes=dict(processes.counts - counts),
+                    errors=dict(timer.errors),
+                )
+                results.append(result)
+                print(f'\npass {n} {"warm" if n > 1 else "cold"}: {elapsed:.2f}s, '
+                      f'{result["updates_per_second"]:.0f} updates/s')
+                print(f'  {"handler":<16}{"count":>7}{"p50":>9}{"p95":>9}{"p99":>9}  ms')
+                for name, stats in result['handlers'].items():
+                    print(f'  {name:<16}{stats["count"]:>7}{stats["p50"]:>9.1f}{stats["p95"]:>9.1f}{stats["p99"]:>9.1f}')
+                for label in ('telegram', 'http', 'processes', 'errors'):
+                    print(f'  {label:<10}' + (', '.join(f'{k}={v}' for k, v in sorted(result[label].items())) or '-'))
+        finally:
+            browser.session.adapters = adapters
+            stand_in.shutdown()
+            stand_in.server_close()
+            session.remove()
+            os.chdir(cwd)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
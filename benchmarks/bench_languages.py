@@ -0,0 +1,119 @@
+"""Compare the previous fetch.languages, with two passes and an EXISTS query per language, with the single
+upsert of store_languages.
+
+python -m benchmarks.bench_languages
+
+The fixture mimics https://www.jw.org/en/languages/ (about 1,000 languages) and the WOL library list. Both
+are generated so no network is needed. Each version runs twice on a temporary database: first the empty
+database (inserts), then with every language already stored (updates).
+"""
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+from sqlalchemy import create_engine
+from sqlalchemy import select
+
+from bot.database import session
+from bot.database import fetch
+from bot.database.schema import Base
+from bot.database.schema import Language
+
+
+LANGUAGES = 1050
+SIGN_LANGUAGES = 100
+
+
+def languages_fixture(seed=0) -> tuple[list[dict], list]:
+    rnd = random.Random(seed)
+    langs = []
+    for i in range(LANGUAGES):
+        code = f'l{i:04}'
+        langs.append({
+            'symbol': code,
+            'langcode': f'M{i:04}',
+            'name': f'Language {i}',
+            'vernacularName': f'Vernacular {i}',
+            'script': rnd.choice(['ROMAN', 'CYRILLIC', 'ARABIC', 'CJK']),
+            'direction': rnd.choice(['ltr', 'ltr', 'ltr', 'rtl']),
+            'isSignLanguage': i < SIGN_LANGUAGES,
+            'isCounted': True,
+            'hasWebContent': rnd.random() < 0.8,
+        })
+    html = '<ul class="librarySelection">' + ''.join(
+        f'<li><a data-meps-symbol="M{i:04}" data-rsconf="r{i}" data-lib="lp-{i}">Language {i}</a></li>'
+        for i in range(LANGUAGES) if i % 3 # some languages have no library
+    ) + '</ul>'
+    anchors = BeautifulSoup(html, 'html.parser').find('ul', class_='librarySelection').find_all('a')
+    return langs, anchors
+
+
+def legacy_store_languages(langs: list[dict], aa: list) -> None:
+    """Previous body of fetch.languages"""
+    def map_language(insert=None, update=None):
+        for lang in langs:
+            if any((e := a) for a in aa if a.get('data-meps-symbol') == lang['langcode']):
+                a = e
+            else:
+                a = {}
+            exists = session.query(select(Language).where(Language.code == lang['symbol']).exists()).scalar()
+            if (insert is True and not exists) or (update is True and exists):
+                yield dict(
+                    code=lang['symbol'],
+                    meps_symbol=lang['langcode'],
+                    name=lang['name'],
+                    vernacular=lang['vernacularName'],
+                    script=lang['script'],
+                    is_rtl=lang['direction'] == 'rtl',
+                    rsconf=a.get('data-rsconf'),
+                    lib=a.get('data-lib'),
+                    is_sign_language=lang['isSignLanguage'],
+                    is_counted=lang['isCounted'],
+                    has_web_content=lang['hasWebContent']
+                )
+    session.bulk_insert_mappings(Language, map_language(insert=True))
+    session.bulk_update_mappings(Language, map_language(update=True))
+    session.commit()
+
+
+def fresh_database(path: Path) -> None:
+    path.unlink(missing_ok=True)
+    engine = create_engine(f'sqlite:///{path}', echo=False)
+    Base.metadata.create_all(engine)
+    session.close()
+    session.bind = engine
+    Base.metadata.bind = engine
+
+
+def signature() -> list[tuple]:
+    return session.execute(select(*Language.__table__.c).order_by(Language.code)).all()
+
+
+def main():
+    langs, anchors = languages_fixture()
+    print(f'{len(langs)} languages, {len(anchors)} wol anchors')
+    bind, metadata_bind = session.bind, Base.metadata.bind
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, store in (('legacy', legacy_store_languages), ('upsert', fetch.store_languages)):
+                fresh_database(Path(tmp) / f'{name}.db')
+                t0 = time.perf_counter()
+                store(langs, anchors)
+                insert = time.perf_counter() - t0
+                renamed = [lang | {'name': lang['name'].upper()} for lang in langs]
+                t0 = time.perf_counter()
+                store(renamed, anchors)
+                update = time.perf_counter() - t0
+                results[name] = signature()
+                print(f'{name:<8} insert {insert:>7.3f}s   update {update:>7.3f}s')
+                session.close()
+    finally:
+        session.bind, Base.metadata.bind = bind, metadata_bind
+    assert results['legacy'] == results['upsert'], 'upsert stored different rows'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Compare the per-marker ORM ingestion of pubmedia with the bulk store_pubmedia.
+
+python -m benchmarks.bench_pubmedia
+
+Both run against a temporary database filled with the verses of the fixture book. The fixture is a
+GETPUBMEDIALINKS response of Psalms in ASL (two qualities of MP4 and M4V, a marker per verse), generated
+from the verse counts of the real book so no network is needed.
+"""
+import json
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy import select
+
+from bot.database import session
+from bot.database import get
+from bot.database.schema import Base
+from bot.database.schema import Bible
+from bot.database.schema import Book
+from bot.database.schema import Chapter
+from bot.database.schema import Edition
+from bot.database.schema import Language
+from bot.database.schema import VideoMarker
+from bot.database import fetch
+from bot.utils import dt_now
+
+
+MEPS_SYMBOL = 'ASL'
+BOOKNUM = 19
+PSALMS_VERSES = [ # verses per chapter
+    6, 12, 8, 8, 12, 10, 17, 9, 20, 18, 7, 8, 6, 7, 5, 11, 15, 50, 14, 9, 13, 31, 6, 10, 22, 12, 14, 9, 11, 12,
+    24, 11, 22, 22, 28, 12, 40, 22, 13, 17, 13, 11, 5, 26, 17, 11, 9, 14, 20, 23, 19, 9, 6, 7, 23, 13, 11, 11, 17,
+    12, 8, 12, 11, 10, 13, 20, 7, 35, 36, 5, 24, 20, 28, 23, 10, 12, 20, 72, 13, 19, 16, 8, 18, 12, 13, 17, 7, 18,
+    52, 17, 16, 15, 5, 23, 11, 13, 12, 9, 9, 5, 8, 28, 22, 35, 45, 48, 43, 13, 31, 7, 10, 10, 9, 8, 18, 19, 2, 29,
+    176, 7, 8, 9, 4, 8, 5, 6, 5, 6, 8, 8, 3, 18, 3, 3, 21, 26, 9, 8, 24, 13, 10, 7, 12, 15, 21, 10, 20, 14, 9, 6
+]
+
+
+def pubmedia_fixture() -> dict:
+    def doc(chapternumber: int, verses: int, quality: str) -> dict:
+        return {
+            'title': f'Psalm {chapternumber}',
+            'track': chapternumber,
+            'label': quality,
+            'file': {
+                'url': f'https://download-a.akamaihd.net/files/media_publication/nwt_{MEPS_SYMBOL}_{BOOKNUM:02}_{chapternumber:03}_r{quality}.mp4',
+                'checksum': f'{BOOKNUM:02}{chapternumber:03}{quality}'.ljust(32, '0'),
+                'modifiedDatetime': '2023-05-02 12:00:00',
+            },
+            'markers': {'markers': [
+                {
+                    'verseNumber': verse,
+                    'label': f'Ps. {chapternumber}:{verse}',
+                    'duration': '00:00:12.012',
+                    'startTime': f'00:{(verse * 12) // 60 % 60:02}:{(verse * 12) % 60:02}.000',
+                    'endTransitionDuration': '00:00:00.500',
+                } for verse in range(1, verses + 1)
+            ]},
+        }
+    return {'files': {MEPS_SYMBOL: {
+        fmt: [doc(chapternumber, verses, quality)
+              for chapternumber, verses in enumerate(PSALMS_VERSES, start=1)
+              for quality in ('240p', '720p')]
+        for fmt in ('MP4', 'M4V')
+    }}}
+
+
+def legacy_store_pubmedia(book: Book, docs: dict[int, dict]) -> None:
+    """Previous body of fetch.chapters_and_videomarkers"""
+    for chapternumber, doc in docs.items():
+        if doc['file']['url'].endswith('.zip'):
+            continue
+        chapter = get.chapter(chapternumber, book)
+        if chapter and chapter.checksum == doc['file']['checksum']:
+            continue
+        elif chapter:
+            chapter.checksum = doc['file']['checksum']
+            chapter.modified_datetime = datetime.fromisoformat(doc['file']['modifiedDatetime'])
+            chapter.url = doc['file']['url']
+            session.query(VideoMarker).filter(VideoMarker.chapter_id == chapter.id).delete()
+            for file in chapter.files:
+                file.is_deprecated = True
+        else:
+            chapter = Chapter(
+                book_id=book.id,
+                number=chapternumber,
+                checksum=doc['file']['checksum'],
+                modified_datetime=datetime.fromisoformat(doc['file']['modifiedDatetime']),
+                url=doc['file']['url'],
+            )
+            session.add(chapter)
+        if doc['markers']:
+            for m in doc['markers']['markers']:
+                chapter.video_markers.append(
+                    VideoMarker(
+                        verse_id=select(Bible.id).where(Bible.book == book.number,
+                                                        Bible.chapter == chapternumber,
+                                                        Bible.verse == int(m['verseNumber'])).scalar() or 0,
+                        versenum=int(m['verseNumber']),
+                        label=m['label'],
+                        duration=m['duration'],
+                        start_time=m['startTime'],
+                        end_transition_duration=m['endTransitionDuration'],
+                    )
+                )
+        session.commit()
+    book.refreshed = dt_now()
+    session.commit()
+
+
+def fresh_database(path: Path) -> Book:
+    """Point the bot session to an empty database with the fixture book"""
+    path.unlink(missing_ok=True)
+    engine = create_engine(f'sqlite:///{path}', echo=False)
+    Base.metadata.create_all(engine)
+    session.close()
+    session.bind = engine
+    Base.metadata.bind = engine
+    session.bulk_insert_mappings(Bible, [
+        dict(book=BOOKNUM, chapter=chapternumber, verse=verse)
+        for chapternumber, verses in enumerate(PSALMS_VERSES, start=1)
+        for verse in range(1, verses + 1)
+    ])
+    session.add(Language(code='ase', meps_symbol=MEPS_SYMBOL, is_sign_language=True))
+    session.add(Edition(id=1, language_code='ase', symbol='nwt'))
+    book = Book(id=1, edition_id=1, number=BOOKNUM, name='Psalms')
+    session.add(book)
+    session.commit()
+    return book
+
+
+def signature() -> list[tuple]:
+    return session.execute(
+        select(Chapter.number, Chapter.checksum, VideoMarker.versenum, VideoMarker.verse_id, VideoMarker.start_time)
+        .join(VideoMarker, VideoMarker.chapter_id == Chapter.id)
+        .order_by(Chapter.number, VideoMarker.versenum)
+    ).all()
+
+
+def main():
+    data = json.loads(json.dumps(pubmedia_fixture())) # same types as a parsed response
+    docs = fetch.pubmedia_docs(data['files'][MEPS_SYMBOL])
+    markers = sum(len(doc['markers']['markers']) for doc in docs.values())
+    print(f'{len(docs)} chapters, {markers} markers')
+    bind, metadata_bind = session.bind, Base.metadata.bind
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, store in (('legacy', legacy_store_pubmedia), ('bulk', fetch.store_pubmedia)):
+                book = fresh_database(Path(tmp) / f'{name}.db')
+                t0 = time.perf_counter()
+                store(book, docs)
+                insert = time.perf_counter() - t0
+                changed = {n: doc | {'file': doc['file'] | {'checksum': doc['file']['checksum'][::-1]}}
+                           for n, doc in docs.items()}
+                t0 = time.perf_counter()
+                store(book, changed)
+                update = time.perf_counter() - t0
+                results[name] = signature()
+                print(f'{name:<8} insert {insert:>7.3f}s   update {update:>7.3f}s')
+                session.close()
+    finally:
+        session.bind, Base.metadata.bind = bind, metadata_bind
+    assert results['legacy'] == results['bulk'], 'bulk ingestion stored different rows'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Compare the old eval-based custom_format with the precompiled Template.
+
+python -m benchmarks.bench_strings
+"""
+import re
+import timeit
+
+from bot.strings import Template
+from bot.strings import TextTranslator
+
+
+SAMPLES = [
+    'Choose a book',
+    'Your bot language is ${language.name} (${language.vernacular})',
+    '${language.vernacular}: ${language.name} ${language.code} ${language.iso_code}',
+]
+NUMBER = 20_000
+
+
+def custom_format(obj, value):
+    """Previous implementation of Self.custom_format"""
+    pt = r'\${ *([\w.]+) *}'
+    while (m := re.search(pt, value)):
+        varname, *keys = m.group(1).split('.')
+        new = eval(f'obj.{varname}' + ''.join([f'.get("{key}")' for key in keys]))  # pylint: disable=eval-used
+        value = re.sub(pt, new, value, 1)
+    return value
+
+
+def main():
+    tt = TextTranslator('es')
+    print(f'{"string":<70} {"eval (µs)":>10} {"template (µs)":>14} {"speedup":>8}')
+    for text in SAMPLES:
+        template = Template(text)
+        assert custom_format(tt, text) == template.render(tt)
+        old = timeit.timeit(lambda: custom_format(tt, text), number=NUMBER) / NUMBER * 1e6
+        new = timeit.timeit(lambda: template.render(tt), number=NUMBER) / NUMBER * 1e6
+        print(f'{text[:70]:<70} {old:>10.2f} {new:>14.2f} {old / new:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Wall time, CPU time and peak RSS of bot.utils.video on synthetic chapter videos.
+
+python -m benchmarks.bench_video
+python -m benchmarks.bench_video --verses 1 4 16 --modes plain overlay delogo --repeat 3 --json video.json
+
+ffmpeg and ffprobe are the real binaries and have to be installed. Nothing is mocked, so the numbers are what
+an engine change would move. The chapter video is generated with lavfi: a testsrc picture with a small testsrc
+patch in the top left corner, where the logo of a real video is, so split can find a box to delogo. Markers are
+transient VideoMarker objects over that file, one every --marker seconds, so no database is needed.
+
+For each mode (plain, overlay, delogo), every verse of the largest verse count is split. Then, for each verse
+count, the first verses are concatenated, and the result is probed and thumbnailed. Each operation runs in a
+fresh process, so its numbers are its own:
+- wall: seconds of the call
+- cpu: user + system seconds of the bot process (frame analysis, drawtext) and of its ffmpeg children
+- rss: peak resident MB of the largest ffmpeg child and of the bot process
+
+Overlay and delogo use select_font. The first time, it downloads the font of the script if it is not in
+bot/utils/fonts yet.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from bot.database.schema import Chapter
+from bot.database.schema import VideoMarker
+from bot.utils import video
+
+
+MODES = {'plain': (False, False), 'overlay': (True, False), 'delogo': (True, True)} # mode: (overlay, delogo)
+WIDTH, HEIGHT = 1280, 720
+RATE = 30
+
+
+def chapter_video(path: Path, seconds: float) -> Path:
+    """Synthetic chapter: moving testsrc with a logo-like patch and a tone"""
+    graph = (
+        f'testsrc=size={WIDTH}x{HEIGHT}:rate={RATE}:duration={seconds}[bg];'
+        f'testsrc=size=180x70:rate={RATE}:duration={seconds},drawbox=color=white:thickness=3[logo];'
+        '[bg]drawbox=x=0:y=0:w=400:h=200:color=black:thickness=fill[clear];'
+        '[clear][logo]overlay=x=20:y=40[v]'
+    )
+    subprocess.run(['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+                    '-filter_complex', graph, '-map', '[v]', '-map', '0:a',
+                    '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-c:a', 'aac',
+                    '-shortest', str(path)], check=True)
+    return path
+
+
+def timestamp(seconds: float) -> str:
+    return f'{int(seconds // 3600):02}:{int(seconds % 3600 // 60):02}:{seconds % 60:06.3f}'
+
+
+def marker(chapter_path: Path, verse: int, seconds: float, mode: str) -> VideoMarker:
+    return VideoMarker(
+        versenum=verse,
+        label=f'Bench {mode} 1:{verse}',
+        start_time=timestamp((verse - 1) * seconds),
+        duration=timestamp(seconds),
+        end_transition_duration='00:00:00.500',
+        chapter=Chapter(number=1, url=str(chapter_path)),
+    )
+
+
+def measured(operation: str, *args) -> dict:
+    """Run one video operation and its rusage. Meant to be the only task of a fresh process"""
+    self0 = resource.getrusage(resource.RUSAGE_SELF)
+    children0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    t0 = time.perf_counter()
+    if operation == 'split':
+        chapter_path, verse, seconds, mode = args
+        overlay, delogo = MODES[mode]
+        result = video.split(marker(chapter_path, verse, seconds, mode),
+                             overlay_text=f'Bench 1:{verse}' if overlay else None, with_delogo=delogo)
+    elif operation == 'concatenate':
+        paths, outname = args
+        result = video.concatenate(paths, outname=outname, title_chapters=[path.stem for path in paths],
+                                   title=outname)
+    elif operation == 'show_streams':
+        result = video.show_streams(args[0])
+    elif operation == 'make_thumbnail':
+        result = video.make_thumbnail(args[0])
+    else:
+        raise ValueError(operation)
+    wall = time.perf_counter() - t0
+    self1 = resource.getrusage(resource.RUSAGE_SELF)
+    children1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return dict(
+        wall=wall,
+        cpu_self=(self1.ru_utime - self0.ru_utime) + (self1.ru_stime - self0.ru_stime),
+        cpu_ffmpeg=(children1.ru_utime - children0.ru_utime) + (children1.ru_stime - children0.ru_stime),
+        rss_ffmpeg=children1.ru_maxrss / 1024, # KB in linux
+        rss_self=self1.ru_maxrss / 1024,
+        result=str(result) if isinstance(result, Path) else None,
+    )
+
+
+def run_isolated(operation: str, *args) -> dict:
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(measured, operation, *args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verses', type=int, nargs='+', default=[1, 3, 8], help='verse counts to concatenate')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--marker', type=float, default=8, help='seconds of each verse')
+    parser.add_argument('--repeat', type=int, default=1, help='runs of every operation, medians are printed')
+    parser.add_argument('--json', type=Path, help='write every run of every operation to this file')
+    args = parser.parse_args()
+    if (missing := [tool for tool in ('ffmpeg', 'ffprobe') if not shutil.which(tool)]):
+        parser.exit(1, f'{" and ".join(missing)} not found in PATH. This benchmark runs the real binaries\n')
+
+    runs = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp) # split and concatenate write to the working directory
+        try:
+            max_verses = max(args.verses)
+            chapter_path = chapter_video(Path(tmp) / 'chapter.mp4', max_verses * args.marker)
+            for mode in args.modes:
+                for n in range(args.repeat):
+                    paths = []
+                    for verse in range(1, max_verses + 1):
+                        r = run_isolated('split', chapter_path, verse, args.marker, mode)
+                        runs.append(dict(operation='split', mode=mode, verses=1, run=n, **r))
+                        paths.append(Path(r['result']))
+                    for verses in args.verses:
+                        r = run_isolated('concatenate', paths[:verses], f'Bench {mode} {verses}')
+                        runs.append(dict(operation='concatenate', mode=mode, verses=verses, run=n, **r))
+                        concatenated = Path(r['result'])
+                        for operation in ('show_streams', 'make_thumbnail'):
+                            r = run_isolated(operation, concatenated)
+                            runs.append(dict(operation=operation, mode=mode, verses=verses, run=n, **r))
+                        concatenated.unlink()
+                    for path in paths:
+                        path.unlink()
+        finally:
+            os.chdir(cwd)
+
+    print(f'{WIDTH}x{HEIGHT} {RATE}fps, {args.marker:g}s per verse, median of {args.repeat}')
+    print(f'{"operation":<16}{"mode":<9}{"verses":>6}{"wall s":>9}{"cpu s":>9}{"ffmpeg cpu s":>14}'
+          f'{"ffmpeg MB":>11}{"self MB":>9}')
+    groups = {}
+    for r in runs:
+        groups.setdefault((r['operation'], r['mode'], r['verses']), []).append(r)
+    for (operation, mode, verses), rs in groups.items():
+        def median(key: str) -> float:
+            return float(np.median([r[key] for r in rs]))
+        print(f'{operation:<16}{mode:<9}{verses:>6}{median("wall"):>9.3f}{median("cpu_self"):>9.3f}'
+              f'{median("cpu_ffmpeg"):>14.3f}{median("rss_ffmpeg"):>11.1f}{median("rss_self"):>9.1f}')
+    if args.json:
+        args.json.write_text(json.dumps([{k: v for k, v in r.items() if k != 'result'} for r in runs], indent=2))
+
+
+if __name__ == '__main__':
+    main()
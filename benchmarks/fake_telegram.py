@@ -0,0 +1,103 @@
+"""Fake Telegram client for the webhook. POSTs recorded updates the way Telegram does and retries on 503.
+
+python -m benchmarks.fake_telegram --url http://127.0.0.1:8443/webhook --secret $WEBHOOK_SECRET --updates updates.jsonl
+python -m benchmarks.fake_telegram --serve --count 2000 --batch 20
+
+--updates is a file with one update json per line, as Telegram sends them. Without it, text messages of --users
+users are generated. --serve starts an in-process WebhookServer with a handler that only sleeps --work seconds,
+so ingestion and backpressure can be measured without a token or network.
+"""
+import argparse
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+from telegram import User
+from telegram.ext import MessageHandler
+from telegram.ext import Filters
+
+
+def synthetic_updates(count: int, users: int) -> list[dict]:
+    now = int(time.time())
+    return [{
+        'update_id': i,
+        'message': {
+            'message_id': i,
+            'date': now,
+            'text': f'Psalms 23:{i % 6 + 1}',
+            'chat': {'id': 1000 + i % users, 'type': 'private'},
+            'from': {'id': 1000 + i % users, 'is_bot': False, 'first_name': f'User {i % users}'},
+        }
+    } for i in range(count)]
+
+
+def recorded_updates(path: Path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+
+
+def post(http: requests.Session, url: str, secret: str, body: list[dict] | dict) -> tuple[float, int]:
+    """Seconds until accepted and how many 503 it got"""
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    t0 = time.perf_counter()
+    for refused in itertools.count():
+        res = http.post(url, json=body, headers=headers, timeout=30)
+        if res.status_code != 503:
+            res.raise_for_status()
+            return time.perf_counter() - t0, refused
+        time.sleep(float(res.headers.get('Retry-After', 1)))
+    raise AssertionError('unreachable')
+
+
+def serve(work: float, workers: int, max_pending: int):
+    from bot.dispatcher import build_updater # pylint: disable=import-outside-toplevel
+    updater = build_updater('123456:fake', workers=workers)
+    updater.bot._bot = User(123456, 'fake', is_bot=True, username='fake_bot') # what get_me would answer
+    updater.dispatcher.add_handler(MessageHandler(Filters.all, lambda update, context: time.sleep(work)))
+    httpd = updater.start_webhook_server('127.0.0.1', 0, max_pending=max_pending)
+    return updater, f'http://127.0.0.1:{httpd.server_address[1]}/'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8443/')
+    parser.add_argument('--secret', default='')
+    parser.add_argument('--updates', type=Path, help='jsonl of recorded updates')
+    parser.add_argument('--count', type=int, default=1000, help='synthetic updates')
+    parser.add_argument('--users', type=int, default=50, help='users of the synthetic updates')
+    parser.add_argument('--batch', type=int, default=1, help='updates per request. Telegram sends 1')
+    parser.add_argument('--connections', type=int, default=40, help='concurrent requests, max_connections')
+    parser.add_argument('--serve', action='store_true', help='in-process webhook server')
+    parser.add_argument('--work', type=float, default=0.05, help='seconds per update of the --serve handler')
+    parser.add_argument('--workers', type=int, default=8, help='workers of the --serve dispatcher')
+    parser.add_argument('--max-pending', type=int, default=200, help='backpressure of the --serve server')
+    args = parser.parse_args()
+
+    updates = recorded_updates(args.updates) if args.updates else synthetic_updates(args.count, args.users)
+    bodies = [updates[i] if args.batch == 1 else updates[i:i + args.batch] for i in range(0, len(updates), args.batch)]
+    updater, url = serve(args.work, args.workers, args.max_pending) if args.serve else (None, args.url)
+    http = requests.Session()
+    http.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=args.connections))
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.connections) as executor:
+        results = list(executor.map(lambda body: post(http, url, args.secret, body), bodies))
+    sent = time.perf_counter() - t0
+    if updater:
+        updater.stop() # waits for the workers to finish every accepted update
+    done = time.perf_counter() - t0
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    print(f'{len(updates)} updates in {len(bodies)} requests of {args.batch}, {args.connections} connections')
+    print(f'accepted in {sent:.2f}s ({len(updates) / sent:.0f} updates/s), '
+          f'{sum(refused for _, refused in results)} refused with 503 and retried')
+    print('request ms  ' + '  '.join(f'p{p}={v:.1f}' for p, v in zip((50, 95, 99), np.percentile(latencies, (50, 95, 99)))))
+    if updater:
+        print(f'processed in {done:.2f}s ({len(updates) / done:.0f} updates/s) by {args.workers} workers')
+
+
+if __name__ == '__main__':
+    main()
@@ -28,3 +28,5 @@ class AdminCommand(StrEnum):
     ENV = 'env'
     RESTART = 'restart'
     GIT = 'git'
+    RELOADSTRINGS = 'reloadstrings'
+    LATENCY = 'latency'
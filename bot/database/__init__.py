@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from sqlalchemy import create_engine
@@ -11,23 +12,32 @@ from bot.database.schema import Base
 from bot.database.views import views
 
 
-PATH_DB = Path(__file__).parent.parent.parent / 'database.db'
+PATH_DB = Path(os.getenv('DATABASE_PATH') or Path(__file__).parent.parent.parent / 'database.db') # env: another file, e.g. the tests'
+BUSY_TIMEOUT = 30 # seconds a connection waits for another thread's write before "database is locked"
 
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA foreign_keys=OFF")
+    cursor.execute("PRAGMA journal_mode=WAL") # readers do not block the writer of another worker, nor it them
+    cursor.execute("PRAGMA synchronous=NORMAL") # with WAL a power loss may undo last commits, never corrupts
     cursor.close()
 
 
 def start_database() -> scoped_session:
-    engine = create_engine(rf'sqlite:///{PATH_DB}', echo=False)
+    engine = create_engine(rf'sqlite:///{PATH_DB}', echo=False, connect_args={'timeout': BUSY_TIMEOUT})
     Base.metadata.bind = engine
     Base.metadata.create_all(engine)
     with engine.connect() as con:
         for view in views:
             con.execute(text(view))
-    return scoped_session(sessionmaker(bind=engine))()
+    return scoped_session(sessionmaker(bind=engine))
 
 
-session = start_database()
+def checkpoint() -> None:
+    """Move the WAL into PATH_DB. Before copying or replacing the file"""
+    with session.get_bind().connect() as con:
+        con.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+
+
+session = start_database() # one session per thread. Workers remove theirs after each update
@@ -7,6 +7,8 @@ from bot.database.schema import File
 from bot.database.schema import File2User
 from bot.database import get
 from bot.utils import dt_now
+from bot.utils.inline_results import inline_results
+from bot.utils.user_sessions import user_sessions
 from bot.logs import get_logger
 
 
@@ -61,8 +63,18 @@ def or_update_user(
     if delogo is not None:
         user.delogo = delogo
     session.commit()
+    user_sessions.forget(telegram_user_id)
     return user
 
+
+def last_active(activity: dict[int, datetime]) -> None:
+    """{User.id: last_active_datetime} in a single batch"""
+    session.bulk_update_mappings(User, [
+        dict(id=user_id, last_active_datetime=last_active_datetime)
+        for user_id, last_active_datetime in activity.items()
+    ])
+    session.commit()
+
 def file(
         chapter_id: int,
         verses: list[int],
@@ -89,6 +101,7 @@ def file(
     )
     session.add(f)
     session.commit()
+    inline_results.forget()
     return f
 
 
@@ -9,20 +9,27 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy import select
 from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
 from bs4 import BeautifulSoup
 
 from bot.logs import get_logger
 from bot.utils import dt_now
 from bot.utils.browser import browser
+from bot.utils.inline_results import inline_results
+from bot.utils.tracing import traced
 from bot.database import session
 from bot.database import get
 from bot.database import report
 from bot.database.schema import Bible
 from bot.database.schema import Edition
 from bot.database.schema import Book
+from bot.database.schema import BookAvailability
 from bot.database.schema import Chapter
 from bot.database.schema import VideoMarker
+from bot.database.schema import File
 from bot.database.schema import Language
+from bot.database.schema import PubmediaValidator
+from bot.database.schema import LanguageName
 from bot.jw import BiblePassage
 from bot import exc
 
@@ -30,40 +37,64 @@ from bot import exc
 logger = get_logger(__name__)
 
 
+@traced('fetch_languages')
 def languages():
     logger.info('Fetching languages...')
     data = browser.open('https://www.jw.org/en/languages/').json()
     wol = browser.open('https://wol.jw.org/en/wol/li/r1/lp-e').soup
-    aa = wol.find('ul', class_='librarySelection').find_all('a')
-
-    def map_language(insert=None, update=None):
-        for lang in data['languages']:
-            if any((e := a) for a in aa if a.get('data-meps-symbol') == lang['langcode']):
-                # 40x faster than a = wol.find('a', attrs={'data-meps-symbol': lang['langcode']})
-                a = e
-            else:
-                a = {}
-            exists = session.query(select(Language).where(Language.code == lang['symbol']).exists()).scalar()
-            if (insert is True and not exists) or (update is True and exists):
-                yield dict(
-                    code=lang['symbol'], # other names: symbol, locale
-                    meps_symbol=lang['langcode'], # other names: code, langcode, wtlocale, data-meps-symbol
-                    name=lang['name'],
-                    vernacular=lang['vernacularName'],
-                    script=lang['script'],
-                    is_rtl=lang['direction'] == 'rtl',
-                    rsconf=a.get('data-rsconf'),
-                    lib=a.get('data-lib'),
-                    is_sign_language=lang['isSignLanguage'],
-                    is_counted=lang['isCounted'],
-                    has_web_content=lang['hasWebContent']
-                )
-    session.bulk_insert_mappings(Language, map_language(insert=True))
-    session.bulk_update_mappings(Language, map_language(update=True))
-    session.commit()
+    store_languages(data['languages'], wol.find('ul', class_='librarySelection').find_all('a'))
     logger.info(f'There are {report.count(Language)} languages stored in the database')
 
 
+def store_languages(langs: list[dict], anchors: list) -> None:
+    """Insert or update every language in one statement. anchors are WOL library links with rsconf and lib"""
+    wol = {}
+    for a in anchors:
+        wol.setdefault(a.get('data-meps-symbol'), a)
+    existing = set(session.scalars(select(Language.code)))
+    rows = []
+    for lang in langs:
+        a = wol.get(lang['langcode'], {})
+        rows.append({
+            'LanguageCode': lang['symbol'], # other names: symbol, locale
+            'LanguageMepsSymbol': lang['langcode'], # other names: code, langcode, wtlocale, data-meps-symbol
+            'LanguageName': lang['name'],
+            'LanguageVernacular': lang['vernacularName'],
+            'LanguageScript': lang['script'],
+            'IsRTL': lang['direction'] == 'rtl',
+            'RsConfigSymbol': a.get('data-rsconf'),
+            'LibrarySymbol': a.get('data-lib'),
+            'IsSignLanguage': lang['isSignLanguage'],
+            'IsCounted': lang['isCounted'],
+            'HasWebContent': lang['hasWebContent'],
+        })
+    if rows:
+        stmt = insert(Language).values(rows)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[Language.code],
+            set_={column: stmt.excluded[column] for column in rows[0] if column != 'LanguageCode'}
+        ))
+    session.commit()
+    inserted = len({row['LanguageCode'] for row in rows} - existing)
+    logger.info(f'{inserted} languages inserted, {len(rows) - inserted} updated')
+
+
+@traced('fetch_language_names')
+def language_names(in_language_code: str) -> int:
+    """Store how every language is said in in_language_code. One request, one statement"""
+    data = browser.open(f'https://www.jw.org/{in_language_code}/languages/').json()
+    rows = [{'LanguageCode': lang['symbol'], 'InLanguageCode': in_language_code, 'Name': lang['name']}
+            for lang in data['languages']]
+    if rows:
+        stmt = insert(LanguageName).values(rows)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[LanguageName.language_code, LanguageName.in_language_code],
+            set_={'Name': stmt.excluded.Name}
+        ))
+        session.commit()
+    logger.info(f'{len(rows)} language names in {in_language_code!r}')
+    return len(rows)
+
 
 def editions(language_code: str = None):
     if language_code is not None and get.edition(language_code):
@@ -91,6 +122,7 @@ def editions(language_code: str = None):
     logger.info(f'There are {report.count(Edition)} bible editions stored in the database')
 
 
+@traced('fetch_books')
 def books(language_code: str, lazy=True):
     if lazy and get.books(language_code):
         logger.info(f"I'm lazy and I'm not going to fetch books in {language_code!r}")
@@ -136,9 +168,9 @@ def _fetch_books_json(edition: Edition) -> None:
 
 def _fetch_books_wol(edition: Edition) -> None:
     "https://wol.jw.org/wol/finder?wtlocale=BRS&pub=nwt"
-    browser.open(f'https://wol.jw.org/wol/finder?wtlocale={edition.language.meps_symbol}&pub=nwt')
-    books = browser.page.find('ul', class_='books hebrew clearfix').findChildren('li', recursive=False) + \
-            browser.page.find('ul', class_='books greek clearfix').findChildren('li', recursive=False)
+    wol = browser.open(f'https://wol.jw.org/wol/finder?wtlocale={edition.language.meps_symbol}&pub=nwt').soup
+    books = wol.find('ul', class_='books hebrew clearfix').findChildren('li', recursive=False) + \
+            wol.find('ul', class_='books greek clearfix').findChildren('li', recursive=False)
     bks = []
     for bk in books:
         book = get.book(language_code=edition.language.code, booknum=int(bk.a['data-bookid']), edition_id=edition.id)
@@ -163,6 +195,22 @@ def _fetch_books_wol(edition: Edition) -> None:
     session.commit()
 
 
+@traced('fetch_book_availability')
+def book_availability(language_code: str) -> BookAvailability:
+    """Store which books have videos in the language"""
+    book = next(iter(get.books(language_code)), None)
+    if book is None:
+        raise exc.BookNotFound
+    booknums = BiblePassage(book).available_booknums
+    availability = get.book_availability(language_code) or BookAvailability(language_code=language_code)
+    availability.raw_booknums = ' '.join(map(str, booknums))
+    availability.refreshed = dt_now(naive=True)
+    session.add(availability)
+    session.commit()
+    logger.info(f'{len(booknums)} books available in {language_code!r}')
+    return availability
+
+
 def need_chapter_and_videomarks(book: Book) -> bool:
     _time_ago = dt_now(naive=True) - timedelta(hours=24) # TODO change hours=24
     if book.refreshed and _time_ago < book.refreshed:
@@ -172,60 +220,97 @@ def need_chapter_and_videomarks(book: Book) -> bool:
         return True
 
 
-def chapters_and_videomarkers(book: Book, all_chapters=True):
+@traced('fetch_pubmedia')
+def chapters_and_videomarkers(book: Book, all_chapters=True, conditional=False):
+    """With conditional=True, send the validators of the last response. If nothing changed, only book.refreshed"""
     url = BiblePassage(book).url_pubmedia(all_chapters)
-    res = browser.open(url)
+    validator = get.pubmedia_validator(book) if conditional else None
+    res = browser.open(url, headers=validator.headers if validator else None)
+    if res.status_code == 304:
+        logger.info(f'Pubmedia not modified {book.edition.language.code!r} {book.number}')
+        book.refreshed = dt_now()
+        session.commit()
+        return
     if res.status_code != 200:
         raise exc.PubmediaNotExists
+    stmt = insert(PubmediaValidator).values(BookId=book.id, ETag=res.headers.get('ETag'),
+                                            LastModified=res.headers.get('Last-Modified'))
+    session.execute(stmt.on_conflict_do_update( # committed along with the chapters
+        index_elements=[PubmediaValidator.book_id],
+        set_={'ETag': stmt.excluded.ETag, 'LastModified': stmt.excluded.LastModified}
+    ))
     data = res.json()['files'][book.edition.language.meps_symbol]
+    store_pubmedia(book, pubmedia_docs(data))
+
 
+def pubmedia_docs(data: dict) -> dict[int, dict]:
+    """{chapternumber: doc} with the best quality file of every chapter"""
     docs = {}
     for ff, items in data.items():
         docs |= dict(map(lambda d: (int(d['track']), d), items)) if ff != '3GP' else {} # best quality
+    return docs
+
+
+def verse_ids(booknum: int) -> dict[tuple[int, int], int]:
+    """{(chapternumber, versenumber): verse_id} of a whole book in one query"""
+    return {(chapter, verse): verse_id for chapter, verse, verse_id in
+            session.execute(select(Bible.chapter, Bible.verse, Bible.id).where(Bible.book == booknum))}
 
+
+def store_pubmedia(book: Book, docs: dict[int, dict]) -> None:
+    """Insert or update chapters and their video markers in a single transaction"""
+    ids = verse_ids(book.number)
+    chapters = {chapter.number: chapter for chapter in get.chapters(book)} # last one wins, like get.chapter
+    new_chapters, updated_chapters, markers = [], [], {}
     for chapternumber, doc in docs.items():
         if doc['file']['url'].endswith('.zip'):
             continue
-        chapter = get.chapter(chapternumber, book)
+        chapter = chapters.get(chapternumber)
         if chapter and chapter.checksum == doc['file']['checksum']:
             continue
-        elif chapter:
+        mapping = dict(
+            number=chapternumber,
+            checksum=doc['file']['checksum'],
+            modified_datetime=datetime.fromisoformat(doc['file']['modifiedDatetime']),
+            url=doc['file']['url'],
+        )
+        if chapter:
             logger.info(f'Updating {chapter.id=}')
-            chapter.checksum = doc['file']['checksum']
-            chapter.modified_datetime = datetime.fromisoformat(doc['file']['modifiedDatetime'])
-            chapter.url = doc['file']['url']
-            session.query(VideoMarker).filter(VideoMarker.chapter_id == chapter.id).delete()
-            for file in chapter.files:
-                file.is_deprecated = True
+            updated_chapters.append(mapping | {'id': chapter.id})
         else:
-            chapter = Chapter(
-                book_id=book.id,
-                number=chapternumber,
-                checksum=doc['file']['checksum'],
-                modified_datetime=datetime.fromisoformat(doc['file']['modifiedDatetime']),
-                url=doc['file']['url'],
-            )
-            session.add(chapter)
+            new_chapters.append(mapping | {'book_id': book.id})
         if doc['markers']:
             # Some sign languages not stored videomarkers in json data api. Must be obtained by ffmpeg url video
-            for m in doc['markers']['markers']:
-                chapter.video_markers.append(
-                    VideoMarker(
-                        verse_id=select(Bible.id).where(Bible.book == book.number,
-                                                        Bible.chapter == chapternumber,
-                                                        Bible.verse == int(m['verseNumber'])).scalar() or 0,
-                        versenum=int(m['verseNumber']),
-                        label=m['label'],
-                        duration=m['duration'],
-                        start_time=m['startTime'],
-                        end_transition_duration=m['endTransitionDuration'],
-                    )
-                )
+            markers[chapternumber] = [dict(
+                verse_id=ids.get((chapternumber, int(m['verseNumber'])), 0),
+                versenum=int(m['verseNumber']),
+                label=m['label'],
+                duration=m['duration'],
+                start_time=m['startTime'],
+                end_transition_duration=m['endTransitionDuration'],
+            ) for m in doc['markers']['markers']]
         else:
-            logger.warning(f'{book.name} {chapter.number} no videomarkers on datajson api {book.edition.language.code}')
-        session.commit()
+            logger.warning(f'{book.name} {chapternumber} no videomarkers on datajson api {book.edition.language.code}')
+
+    if updated_chapters:
+        updated_ids = [mapping['id'] for mapping in updated_chapters]
+        session.bulk_update_mappings(Chapter, updated_chapters)
+        session.query(VideoMarker).filter(VideoMarker.chapter_id.in_(updated_ids)).delete(synchronize_session=False)
+        (session.query(File)
+         .filter(File.chapter_id.in_(updated_ids))
+         .update({File.is_deprecated: True}, synchronize_session=False))
+    if new_chapters:
+        session.bulk_insert_mappings(Chapter, new_chapters, return_defaults=True)
+    chapter_ids = {mapping['number']: mapping['id'] for mapping in updated_chapters + new_chapters}
+    session.bulk_insert_mappings(VideoMarker, [
+        marker | {'chapter_id': chapter_ids[chapternumber]}
+        for chapternumber, chapter_markers in markers.items()
+        for marker in chapter_markers
+    ])
     book.refreshed = dt_now()
     session.commit()
+    if updated_chapters:
+        inline_results.forget() # their files are [OLD] now
 
 
 def need_ffmpeg(chapter: Chapter) -> bool:
@@ -238,6 +323,7 @@ def need_ffmpeg(chapter: Chapter) -> bool:
     return True
 
 
+@traced('fetch_videomarkers_ffmpeg')
 def videomarkers_by_ffmpeg(chapter: Chapter):
     """Use this method only if videomarkers not stored on data json api.
     No use for bulk. It's slow and expensive. 
@@ -255,13 +341,12 @@ def videomarkers_by_ffmpeg(chapter: Chapter):
     url = url_lq[chapter.number]
     session.query(VideoMarker).filter(VideoMarker.chapter_id == chapter.id).delete()
     markers = _ffprobe_markers(url)
+    ids = verse_ids(chapter.book.number)
     for m in markers:
         chapter.video_markers.append(
             VideoMarker(
                 versenum=m['verseNumber'],
-                verse_id=select(Bible.id).where(Bible.book == chapter.book.number,
-                                                Bible.chapter == m['chapterNumber'],
-                                                Bible.verse == m['verseNumber']).scalar() or 0,
+                verse_id=ids.get((m['chapterNumber'], m['verseNumber']), 0),
                 label=m['label'],
                 duration=m['duration'],
                 start_time=m['startTime'],
@@ -1,10 +1,18 @@
+from datetime import datetime
+
 from sqlalchemy import select
+from sqlalchemy import tuple_
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.orm import joinedload
 
 from bot.logs import get_logger
 from bot.database import session
 from bot.database.schema import Language
+from bot.database.schema import LanguageName
 from bot.database.schema import Edition
 from bot.database.schema import Book
+from bot.database.schema import BookAvailability
+from bot.database.schema import PubmediaValidator
 from bot.database.schema import Chapter
 from bot.database.schema import VideoMarker
 from bot.database.schema import File
@@ -35,6 +43,12 @@ def parse_language(code_or_meps: str) -> Language | None:
     return language(code=code_or_meps.lower()) or language(meps_symbol=code_or_meps.upper())
 
 
+def language_names(in_language_code: str) -> dict[str, str]:
+    """{language_code: name} of every language said in in_language_code"""
+    return dict(session.execute(select(LanguageName.language_code, LanguageName.name)
+                                .where(LanguageName.in_language_code == in_language_code)).all())
+
+
 def sign_languages_meps_symbol() -> list[str]:
     return session.scalars(select(Language.meps_symbol).filter(Language.is_sign_language == True)).all()
 
@@ -77,6 +91,14 @@ def books(language_code: str = None, booknum: int = None) -> list[Book]:
     return q.order_by(Book.number.asc()).all()
 
 
+def refreshed_books(before: datetime) -> list[Book]:
+    """Books fetched at least once whose chapters were refreshed before the datetime"""
+    return (session.query(Book)
+            .filter(Book.refreshed != None, Book.refreshed < before) # pylint: disable=singleton-comparison
+            .order_by(Book.refreshed.asc())
+            .all())
+
+
 def book(language_code: str, booknum: int | str, edition_id: int | None = None) -> Book | None:
     q = (
         session.query(Book)
@@ -91,6 +113,18 @@ def book(language_code: str, booknum: int | str, edition_id: int | None = None)
         q = q.filter(Edition.id == edition_id)
     return q.one_or_none()
 
+def book_availability(language_code: str) -> BookAvailability | None:
+    return session.get(BookAvailability, language_code)
+
+
+def book_availabilities() -> list[BookAvailability]:
+    return session.query(BookAvailability).order_by(BookAvailability.refreshed.asc()).all()
+
+
+def pubmedia_validator(book: Book) -> PubmediaValidator | None:
+    return session.get(PubmediaValidator, book.id)
+
+
 def chapter(chapternum: int, book: Book, checksum: str | None = None) -> Chapter | None:
     q = (session.query(Chapter)
          .join(Book, Book.id == Chapter.book_id)
@@ -162,13 +196,21 @@ def files(
         overlay_language_code: str | None = False,
         is_deprecated: bool = None,
         limit: int = 0,
+        after_file_id: int | None = None,
     ) -> list[File | None]:
+    """Files sorted by book, chapter, verses and id. after_file_id is the keyset cursor: only files after that
+    one in the same order, so pages cost the same wherever they are"""
     q = (
         session.query(File)
         .join(Chapter, Chapter.id == File.chapter_id)
         .join(Book, Book.id == Chapter.book_id)
         .join(Edition, Edition.id == Book.edition_id)
         .join(Language, Language.code == Edition.language_code)
+        .options(contains_eager(File.chapter)
+                 .contains_eager(Chapter.book)
+                 .contains_eager(Book.edition)
+                 .contains_eager(Edition.language),
+                 joinedload(File.overlay_language))
     )
     if sign_language_code is not None:
         q = q.filter(Language.code == sign_language_code)
@@ -184,7 +226,16 @@ def files(
         q = q.filter(File.overlay_language_code == overlay_language_code)
     if is_deprecated is not None:
         q = q.filter(File.is_deprecated == is_deprecated)
-    q = q.order_by(Book.number.asc(), Chapter.number.asc(), File.raw_verses.asc())
+    if after_file_id is not None:
+        cursor = (session.query(Book.number, Chapter.number, File.raw_verses, File.id)
+                  .join(Chapter, Chapter.id == File.chapter_id)
+                  .join(Book, Book.id == Chapter.book_id)
+                  .filter(File.id == after_file_id)
+                  .one_or_none())
+        if cursor is None:
+            return []
+        q = q.filter(tuple_(Book.number, Chapter.number, File.raw_verses, File.id) > tuple_(*cursor))
+    q = q.order_by(Book.number.asc(), Chapter.number.asc(), File.raw_verses.asc(), File.id.asc())
     if limit > 0:
         q = q.limit(limit)
     return q.all()
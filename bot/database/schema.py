@@ -64,6 +64,15 @@ class Language(Base):
                                                      foreign_keys='[File.overlay_language_code]')
 
 
+class LanguageName(Base):
+    """Name of a language said in another language. Filled in bulk by background job"""
+    __tablename__ = 'LanguageName'
+
+    language_code = Column('LanguageCode', String, ForeignKey('Language.LanguageCode'), primary_key=True)
+    in_language_code = Column('InLanguageCode', String, ForeignKey('Language.LanguageCode'), primary_key=True)
+    name = Column('Name', String, nullable=False)
+
+
 class Edition(Base):
     __tablename__ = 'Edition'
     __table_args__ = (UniqueConstraint('LanguageCode', 'SymbolEdition'), )
@@ -111,6 +120,34 @@ class Book(Base):
         return self.edition.language
 
 
+class PubmediaValidator(Base):
+    """ETag and Last-Modified of the last pubmedia response of a book. Sent back by the catalog job"""
+    __tablename__ = 'PubmediaValidator'
+
+    book_id = Column('BookId', Integer, ForeignKey('Book.BookId'), primary_key=True)
+    etag = Column('ETag', String)
+    last_modified = Column('LastModified', String)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        """Conditional request headers"""
+        return {header: value for header, value in (('If-None-Match', self.etag),
+                                                    ('If-Modified-Since', self.last_modified)) if value}
+
+
+class BookAvailability(Base):
+    """Books with videos in a language, from WOL binav page. Refreshed in background"""
+    __tablename__ = 'BookAvailability'
+
+    language_code = Column('LanguageCode', String, ForeignKey('Language.LanguageCode'), primary_key=True)
+    raw_booknums = Column('BookNumbers', String, default='')
+    refreshed = Column('RefreshedOnDate', DateTime)
+
+    @property
+    def booknums(self) -> list[int]:
+        return list(map(int, self.raw_booknums.split()))
+
+
 class Chapter(Base):
     __tablename__ = 'Chapter'
     __table_args__ = (UniqueConstraint('BookId', 'ChapterNumber'), )
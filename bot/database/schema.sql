@@ -26,6 +26,16 @@ CREATE TABLE "Language" (
 	UNIQUE ("LanguageMepsSymbol")
 )
 
+;
+CREATE TABLE "LanguageName" (
+	"LanguageCode" VARCHAR NOT NULL, 
+	"InLanguageCode" VARCHAR NOT NULL, 
+	"Name" VARCHAR NOT NULL, 
+	PRIMARY KEY ("LanguageCode", "InLanguageCode"), 
+	FOREIGN KEY("LanguageCode") REFERENCES "Language" ("LanguageCode"), 
+	FOREIGN KEY("InLanguageCode") REFERENCES "Language" ("LanguageCode")
+)
+
 ;
 CREATE TABLE "Edition" (
 	"EditionId" INTEGER NOT NULL, 
@@ -87,6 +97,24 @@ CREATE TABLE "Book" (
 	UNIQUE ("BookNumber", "EditionId")
 )
 
+;
+CREATE TABLE "PubmediaValidator" (
+	"BookId" INTEGER NOT NULL, 
+	"ETag" VARCHAR, 
+	"LastModified" VARCHAR, 
+	PRIMARY KEY ("BookId"), 
+	FOREIGN KEY("BookId") REFERENCES "Book" ("BookId")
+)
+
+;
+CREATE TABLE "BookAvailability" (
+	"LanguageCode" VARCHAR NOT NULL, 
+	"BookNumbers" VARCHAR, 
+	"RefreshedOnDate" DATETIME, 
+	PRIMARY KEY ("LanguageCode"), 
+	FOREIGN KEY("LanguageCode") REFERENCES "Language" ("LanguageCode")
+)
+
 ;
 CREATE TABLE "Chapter" (
 	"ChapterId" INTEGER NOT NULL, 
@@ -0,0 +1,152 @@
+"""Updates of different users are processed in parallel, updates of the same user one after another in the order
+they arrived. One user cutting a long video no longer delays everyone else.
+
+Each update runs in a worker thread with its own database session (see bot.database.session), removed when the
+update is done. The time an update waits for a worker is recorded as the 'queue_wait' stage of tracing."""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from queue import Queue
+from typing import Callable, Hashable
+from urllib.parse import urlsplit
+
+from telegram import Update
+from telegram.ext import Dispatcher
+from telegram.ext import ExtBot
+from telegram.ext import JobQueue
+from telegram.ext import Updater
+from telegram.utils.request import Request
+
+from bot.database import session
+from bot.logs import get_logger
+from bot.secret import WORKERS
+from bot.utils import tracing
+from bot.webhook import WebhookServer
+
+
+logger = get_logger(__name__)
+
+
+class KeyedExecutor:
+    """Pool of threads. Tasks of the same key run in submission order, never two at once"""
+    def __init__(self, max_workers: int, thread_name_prefix: str = 'keyed'):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._pending: dict[Hashable, deque[Callable[[], None]]] = {} # keys with a task running or waiting
+        self._count = 0 # tasks running or waiting
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, fn: Callable, *args, **kwargs) -> None:
+        task = partial(fn, *args, **kwargs)
+        with self._lock:
+            self._count += 1
+            if key in self._pending:
+                self._pending[key].append(task) # the running drain of this key will take it
+                return
+            self._pending[key] = deque([task])
+        self._executor.submit(self._drain, key)
+
+    def _drain(self, key: Hashable) -> None:
+        while True:
+            with self._lock:
+                tasks = self._pending[key]
+                if not tasks:
+                    del self._pending[key]
+                    return
+                task = tasks.popleft()
+            try:
+                task()
+            except Exception:
+                logger.exception(f'Task of {key!r} failed')
+            finally:
+                with self._lock:
+                    self._count -= 1
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._count
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+class KeyedDispatcher(Dispatcher):
+    """Dispatcher that hands each update to a KeyedExecutor keyed by user instead of processing it in its
+    own thread"""
+    def __init__(self, *args, workers: int = WORKERS, **kwargs):
+        super().__init__(*args, workers=workers, **kwargs)
+        self.executor = KeyedExecutor(workers, thread_name_prefix='update')
+
+    @staticmethod
+    def key(update: Update) -> Hashable:
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+        return ('update', update.update_id) # nothing to keep in order with
+
+    def process_update(self, update: object) -> None:
+        if not isinstance(update, Update):
+            super().process_update(update) # polling errors
+            return
+        self.executor.submit(self.key(update), self._process, update, time.time(), time.perf_counter())
+
+    def _process(self, update: Update, queued_at: float, t0: float) -> None:
+        with tracing.bind(update):
+            tracing.record('queue_wait', queued_at, time.perf_counter() - t0)
+            try:
+                super().process_update(update)
+            finally:
+                session.remove()
+
+    def stop(self) -> None:
+        super().stop()
+        self.executor.shutdown(wait=True)
+
+
+class KeyedUpdater(Updater):
+    """Updater of a KeyedDispatcher. Besides start_polling it can receive updates with a WebhookServer"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._webhook_threads: list[threading.Thread] = []
+
+    def start_webhook_server(self, listen: str, port: int, webhook_url: str | None = None,
+                             secret_token: str | None = None, max_connections: int = 40,
+                             max_pending: int = 200) -> WebhookServer:
+        """Serve on listen:port the path of webhook_url. If webhook_url is given, telegram is told to use it.
+        updater.idle() and updater.stop() shut it down as they do with start_webhook"""
+        path = (urlsplit(webhook_url).path or '/') if webhook_url else '/'
+        self.running = True
+        self.job_queue.start()
+        dispatcher_ready = threading.Event()
+        self.httpd = WebhookServer((listen, port), self.dispatcher, path, secret_token, max_pending)
+        self._webhook_threads = [
+            threading.Thread(target=self.dispatcher.start, kwargs=dict(ready=dispatcher_ready), name='dispatcher'),
+            threading.Thread(target=self.httpd.serve_forever, name='webhook'),
+        ]
+        for thread in self._webhook_threads:
+            thread.start()
+        dispatcher_ready.wait()
+        if webhook_url:
+            self.bot.set_webhook(webhook_url, max_connections=max_connections, secret_token=secret_token or None)
+        logger.info(f'Webhook listening on {listen}:{port}{path}')
+        return self.httpd
+
+    def stop(self) -> None:
+        httpd = self.httpd
+        super().stop()
+        for thread in self._webhook_threads:
+            thread.join()
+        self._webhook_threads = []
+        if isinstance(httpd, WebhookServer):
+            httpd.server_close()
+
+
+def build_updater(token: str, workers: int = WORKERS) -> KeyedUpdater:
+    # connections: keyed workers, run_async workers, dispatcher, polling, job queue and main thread
+    bot = ExtBot(token, request=Request(con_pool_size=2 * workers + 4))
+    job_queue = JobQueue()
+    dispatcher = KeyedDispatcher(bot, Queue(), job_queue=job_queue, workers=workers)
+    job_queue.set_dispatcher(dispatcher)
+    return KeyedUpdater(dispatcher=dispatcher, workers=None)
@@ -25,8 +25,10 @@ from bot.handlers.admin import env_handler
 from bot.handlers.admin import replace_db_handler
 from bot.handlers.admin import restart_handler
 from bot.handlers.admin import git_handler
+from bot.handlers.admin import latency_handler
 # from bot.handlers.admin import reset_chapter_handler 
 from bot.handlers.admin.set_commands import set_commands_handler
+from bot.handlers.admin.set_commands import reload_strings_handler
 from bot.handlers.admin.logs import notice_handler
 from bot.handlers.admin.logs import flushlogs_handler
 from bot.handlers.admin.logs import error_handler
@@ -61,11 +63,13 @@ handlers = [
     backup_handler,
     flushlogs_handler,
     set_commands_handler,
+    reload_strings_handler,
     getting_user_handler,
     database_status_handler,
     notice_handler,
     replace_db_handler,
     git_handler,
+    latency_handler,
 
     # reset_chapter_handler,
 
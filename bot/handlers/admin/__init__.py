@@ -6,4 +6,5 @@ from .db_status import replace_db_handler
 from .env import env_handler
 from .env import restart_handler
 from .env import git_handler
+from .latency import latency_handler
 # from .reset_chapter import reset_chapter_handler
@@ -20,8 +20,17 @@ from bot.database.report import count
 from bot.database.schema import File, File2User, VideoMarker, Chapter, Book, Edition, Language, User
 from bot.database import get
 from bot.database import PATH_DB
+from bot.database import checkpoint
+from bot.database import session
+from bot.handlers.settings import forget_signlangs_menus
+from bot.jw.base_bible import forget_bible_index
 from bot.strings import TextTranslator
 from bot.utils import how_to_say
+from bot.utils.browser import browser
+from bot.utils.inline_results import inline_results
+from bot.utils.keyboards import keyboards
+from bot.utils.user_sessions import user_sessions
+from bot.utils.utils import forget_language_names
 
 
 @vip
@@ -42,6 +51,7 @@ def stats(update: Update, _: CallbackContext) -> None:
             text=tt.stats(total_verses, len(sign_language_codes), total_overlay, *rdb.duration_size(user.id)),
             parse_mode=ParseMode.HTML)
     if update.effective_user.id == ADMIN:
+        cache = browser.cache.stats()
         update.message.reply_html(
             '<pre>'
             f'{rdb.sum_duration():>5} Duración versículos cortados\n'
@@ -62,6 +72,11 @@ def stats(update: Update, _: CallbackContext) -> None:
             f'{count(User, "User.status == User.AUTHORIZED"):>5} Usuarios permitidos\n'
             f'{count(User, "User.status == User.WAITING"):>5} Usuarios en lista de espera\n'
             f'{count(User, "User.status == User.DENIED"):>5} Usuarios bloqueados\n'
+            f'{cache["hits"]:>5} Respuestas HTTP desde caché\n'
+            f'{cache["revalidated"]:>5} Respuestas HTTP revalidadas\n'
+            f'{cache["misses"]:>5} Respuestas HTTP descargadas\n'
+            f'{cache["entries"]:>5} Respuestas HTTP en caché\n'
+            f'{cache["bytes"] // 2**20:>5} MB de caché HTTP\n'
             '</pre>'
         )
 
@@ -78,12 +93,21 @@ def document(update: Update, context: CallbackContext):
 
 def overwrite_db(update: Update, context: CallbackContext):
     update.effective_message.edit_reply_markup()
+    checkpoint()
     try:
         update.effective_message.reply_document(document=open(PATH_DB, 'rb'), filename= f'{now()} {PATH_DB}')
     except:
         pass
     db_doc: Document = context.user_data['db']
     db_doc.get_file().download(PATH_DB)
+    # nothing read from the old database may survive
+    session.remove()
+    forget_bible_index()
+    user_sessions.clear()
+    keyboards.clear()
+    inline_results.forget()
+    forget_signlangs_menus()
+    forget_language_names()
     update.effective_message.reply_text('Database has been replaced')
     del context.user_data['db']
     return -1
@@ -0,0 +1,32 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+from telegram.ext import CommandHandler
+
+from bot import AdminCommand
+from bot.database import get
+from bot.strings import TextTranslator
+from bot.utils.decorators import vip, admin
+from bot.utils import tracing
+
+
+@vip
+@admin
+def latency(update: Update, context: CallbackContext) -> None:
+    tt = TextTranslator(get.user(update.effective_user.id).bot_language.code)
+    hours = int(context.args[0]) if context.args and context.args[0].isdigit() else 24 * 7
+    rows = tracing.percentiles(hours)
+    if not rows:
+        update.message.reply_html(tt.latency_empty(hours))
+        return
+    width = max(len(stage) for stage, *_ in rows)
+    update.message.reply_html(
+        '<pre>'
+        f'{"stage":<{width}} {"n":>5} {"p50":>7} {"p95":>7} {"p99":>7}\n' +
+        '\n'.join(f'{stage:<{width}} {count:>5} {p50:>7.2f} {p95:>7.2f} {p99:>7.2f}'
+                  for stage, count, p50, p95, p99 in rows) +
+        '\n\n' + tt.latency_footer(hours) +
+        '</pre>'
+    )
+
+
+latency_handler = CommandHandler(AdminCommand.LATENCY, latency)
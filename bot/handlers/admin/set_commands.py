@@ -42,4 +42,14 @@ def reset_commands(update: Update, context: CallbackContext):
         scope=BotCommandScopeChat(ADMIN))
     update.message.reply_text(TextTranslator(user.bot_language.code).setcommands)
 
+
+
+@vip
+@admin
+def reload_strings(update: Update, _: CallbackContext):
+    strings.reload()
+    update.message.reply_text(TextTranslator(get.user(update.effective_user.id).bot_language.code).strings_reloaded)
+
+
 set_commands_handler = CommandHandler(AdminCommand.SETCOMMANDS, reset_commands)
+reload_strings_handler = CommandHandler(AdminCommand.RELOADSTRINGS, reload_strings)
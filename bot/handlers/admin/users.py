@@ -13,6 +13,7 @@ from bot.database import get
 from bot.database import add
 from bot.database import fetch
 from bot.database import PATH_DB
+from bot.database import checkpoint
 from bot.database.schema import User
 from bot import AdminCommand
 from bot.logs import get_logger
@@ -103,6 +104,7 @@ def sending_users(update: Update, _: CallbackContext):
 @vip
 @admin
 def backup(update: Update, context: CallbackContext):
+    checkpoint()
     context.bot.send_document(chat_id=update.effective_chat.id,
                               document=open(PATH_DB, 'rb'),
                               filename= f'{now()} {PATH_DB}')
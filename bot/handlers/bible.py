@@ -21,18 +21,25 @@ from bot.secret import TOPIC_ERROR
 from bot.logs import get_logger
 from bot.jw import BiblePassage
 from bot.jw import BibleEpub
+from bot.jw import epub as jw_epub
 from bot.utils import video
 from bot.utils import how_to_say
 from bot.database import get
 from bot.database import fetch
 from bot.database import add
+from bot.database import session
 from bot import exc
-from bot.database.schema import File, Language
+from bot.database.schema import File, Language, User
 from bot.handlers.settings import set_language
 from bot.utils import list_of_lists
 from bot.utils import safechars
 from bot.utils.decorators import vip
 from bot.utils.decorators import forw
+from bot.utils.demand import record_demand
+from bot.utils.demand import request_book_availability
+from bot.utils.keyboards import keyboards
+from bot.utils.tracing import span
+from bot.utils.tracing import traced
 from bot.strings import TextTranslator
 
 
@@ -43,9 +50,11 @@ HTML = ParseMode.HTML
 
 
 @vip
+@traced('parse_query')
 def parse_query(update: Update, context: CallbackContext) -> None:
     logger.info(f'{context.args=}, {update.effective_message.text}')
-    orig_sl = get.user(update.effective_user.id).sign_language
+    user = get.user(update.effective_user.id)
+    tt = TextTranslator(user.bot_language_code)
 
     def command(string: str) -> str:
         return re.match(r'/([\w-]+)', string).group(1) if string.startswith('/') else ''
@@ -53,62 +62,80 @@ def parse_query(update: Update, context: CallbackContext) -> None:
         return string if not string.startswith('/') else ' '.join(string.split()[1:])
 
     lines = update.effective_message.text.splitlines()[:5]
+    sign_languages = user.sign_languages
+    replies = [] # in line order: (query, sign_languages) or an error already rendered
     for text in lines:
         if not command(text):
-            parse_query_bible(update, context, text)
+            replies.append((text, sign_languages))
+            continue
+        language = get.parse_language(command(text))
+        if not language:
+            replies.append(tt.not_language(command(text)))
+            continue
+        if query(text):
+            if language.is_sign_language is True:
+                # sign language only for the rest of this message
+                sign_languages = [language] + user.sign_languages[1:]
+                replies.append((query(text), [language]))
+        elif len(lines) == 1:
+            # change language permanent
+            set_language(update, context, code_or_meps=language.code)
+            return
         else:
-            language = get.parse_language(command(text))
-            if not language:
-                user = get.user(update.effective_user.id)
-                tt = TextTranslator(user.bot_language_code)
-                update.effective_message.reply_html(tt.not_language(command(text)))
-                continue
-            if query(text):
-                if language.is_sign_language is True:
-                    add.or_update_user(update.effective_user.id, sign_language_code=language.code)
-                    parse_query_bible(update, context, query(text), language)
-            elif len(lines) == 1 and language and not query(text):
-                # change language permanent
-                set_language(update, context, code_or_meps=language.code)
-                return
-            elif language and not query(text):
-                add.or_update_user(update.effective_user.id, sign_language_code=language.code)
-
-    add.or_update_user(update.effective_user.id, sign_language_code=orig_sl.code)
+            sign_languages = [language] + user.sign_languages[1:]
+
+    queries = [reply for reply in replies if not isinstance(reply, str)]
+    with span('check_passage'):
+        passages = iter(BiblePassage.from_human_many([q for q, _ in queries], user.bot_language_code))
+    for reply in replies:
+        if isinstance(reply, str):
+            update.effective_message.reply_html(reply)
+            continue
+        (q, sls), passage = reply, next(passages)
+        if isinstance(passage, exc.BaseBibleException):
+            update.effective_message.reply_text(citation_error(q, passage, user.bot_language_code), parse_mode=HTML)
+        else:
+            parse_query_bible(update, context, passage, user, sls)
+    session.commit()
 
 
-def check_passage(query: str, bot_language_code: str) -> BiblePassage | str:
+def citation_error(query: str, e: exc.BaseBibleException, bot_language_code: str) -> str:
     tt = TextTranslator(bot_language_code)
-    try:
-        passage = BiblePassage.from_human(query, bot_language_code)
-    except exc.BibleCitationNotFound:
-        return f'<b>{query}:</b> ' + tt.fallback(MyCommand.HELP, report.count_signlanguage())
-    except exc.BookNameNotFound as e:
+    if isinstance(e, exc.BookNameNotFound):
         return tt.book_not_found(e.book_like)
-    except exc.MissingChapterNumber as e:
+    elif isinstance(e, exc.MissingChapterNumber):
         return tt.missing_chapter(e.bookname)
-    except exc.ChapterNotExists as e:
+    elif isinstance(e, exc.ChapterNotExists):
         return tt.chapter_not_exists(e.bookname, e.chapternum, e.last_chapternum)
-    except exc.VerseNotExists as e:
+    elif isinstance(e, exc.VerseNotExists):
         d = (BiblePassage.from_num(bot_language_code, e.booknum).book.name, e.chapternum, e.wrong_verses,
              e.last_versenum, e.count_wrong)
         return tt.verse_not_exists(*d) if e.count_wrong == 1 else tt.verses_not_exists(*d)
-    except exc.VerseOmitted as e:
+    elif isinstance(e, exc.VerseOmitted):
         return tt.is_omitted(e.citation)
     else:
-        return passage
+        return f'<b>{query}:</b> ' + tt.fallback(MyCommand.HELP, report.count_signlanguage())
 
 
+def check_passage(query: str, bot_language_code: str) -> BiblePassage | str:
+    try:
+        return BiblePassage.from_human(query, bot_language_code)
+    except exc.BaseBibleException as e:
+        return citation_error(query, e, bot_language_code)
+
+
+@traced('prepare_passage')
 def prepare_passage(passage: BiblePassage, sl_code: str, update: Update, tt: TextTranslator):
     try:
         passage.set_language(sl_code)
     except exc.BookNotFound:
         fetch.books(language_code=sl_code)
         passage.set_language(sl_code)
-    if fetch.need_chapter_and_videomarks(passage.book):
+    if passage.book.refreshed is None: # first time, later refresh_catalog job keeps it up to date
         update.message.reply_chat_action(ChatAction.TYPING)
         fetch.chapters_and_videomarkers(passage.book) # could raise PubmediaNotExists
         passage.refresh()
+    record_demand(passage.book)
     if passage.verses and passage.chapter:
         if fetch.need_ffmpeg(passage.chapter) is True:
             update.effective_message.reply_chat_action(ChatAction.TYPING)
@@ -118,38 +145,35 @@ def prepare_passage(passage: BiblePassage, sl_code: str, update: Update, tt: Tex
             m.delete()
 
 
-def parse_query_bible(update: Update, context: CallbackContext, query: str, sign_language: Language = None) -> None:
-    logger.info("query: %s", query)
-    user = get.user(update.effective_user.id)
+def parse_query_bible(update: Update, context: CallbackContext, passage: BiblePassage, user: User,
+                      sign_languages: list[Language]) -> None:
+    logger.info("passage: %s", passage.citation)
     tt = TextTranslator(user.bot_language.code)
-    if isinstance(passage := check_passage(query, user.bot_language_code), str):
-        update.effective_message.reply_text(passage, parse_mode=HTML)
-        return
     if passage.verses:
         context.user_data['msg'] = None
-        for sl in ([sign_language] if sign_language else user.sign_languages):
+        for sl in sign_languages:
             try:
                 prepare_passage(passage, sl.code, update, tt)
             except exc.PubmediaNotExists:
                 continue
             if passage.chapter and not get.unavailable_verses(passage.chapter, passage.verses):
-                manage_verses(update, context, passage)
+                manage_verses(update, context, passage, user)
                 return
-    sl = sign_language or user.sign_language
+    sl = sign_languages[0]
     try:
         prepare_passage(passage, sl.code, update, tt)
     except exc.PubmediaNotExists:
         passage.set_language(user.bot_language.code)
         update.effective_message.reply_text(
             text=tt.that_book_no(passage.book.name, how_to_say(sl.code, user.bot_language_code)), parse_mode=HTML)
-        show_books(update, context, passage.set_language(sl.code))
+        show_books(update, context, passage.set_language(sl.code), user)
         return
     if passage.chapternumber and not passage.chapter:
         p = BiblePassage.from_num(user.bot_language_code, passage.book.number)
         update.effective_message.reply_text(
             tt.that_chapter_no(p.book.name, how_to_say(sl.code, user.bot_language_code)) + " " + tt.but_these_chapters,
             parse_mode=HTML)
-        show_chapters(update, context, passage.set_language(sl.code))
+        show_chapters(update, context, passage.set_language(sl.code), user)
         return
     if passage.chapter and passage.verses:
         unavailable_verses = get.unavailable_verses(passage.chapter, passage.verses)
@@ -159,63 +183,70 @@ def parse_query_bible(update: Update, context: CallbackContext, query: str, sign
                 tt.that_verse_no(BiblePassage(passage.book, passage.chapternumber, unavailable_verses).citation,
                                 how_to_say(sl.code, user.bot_language_code)) + " " +
                 tt.but_these_verses, parse_mode=HTML)
-            show_verses(update, context, passage.set_language(sl.code))
+            show_verses(update, context, passage.set_language(sl.code), user)
             return
     if passage.chapternumber:
-        show_verses(update, context, passage.set_language(sl.code))
+        show_verses(update, context, passage.set_language(sl.code), user)
     else:
-        show_chapters(update, context, passage.set_language(sl.code))
+        show_chapters(update, context, passage.set_language(sl.code), user)
 
 
-def show_books(update: Update, context: CallbackContext, p: BiblePassage) -> None:
-    user = get.user(update.effective_user.id)
+def show_books(update: Update, context: CallbackContext, p: BiblePassage, user: User) -> None:
     tt = TextTranslator(user.bot_language.code)
-    buttons = list_of_lists(
-        [InlineKeyboardButton(
-            get.book(user.bot_language.code, booknum).official_abbreviation,
-            callback_data=f'{SELECT_BOOK}|{p.language.code}|{booknum}'
-        ) for booknum in p.available_booknums],
-        columns=5
-    )
+    if not (availability := get.book_availability(p.language.code)):
+        request_book_availability(p.language.code) # meanwhile every stored book is listed
+    booknums = availability.booknums if availability else [book.number for book in get.books(p.language.code)]
+
+    def build() -> InlineKeyboardMarkup:
+        abbreviations = {book.number: book.official_abbreviation for book in get.books(user.bot_language.code)}
+        return InlineKeyboardMarkup(list_of_lists(
+            [InlineKeyboardButton(
+                abbreviations[booknum],
+                callback_data=f'{SELECT_BOOK}|{p.language.code}|{booknum}'
+            ) for booknum in booknums if booknum in abbreviations],
+            columns=5
+        ))
 
-    sign_language = p.language
-    p.set_language(user.bot_language.code)
     context.user_data['msg'] = context.bot.send_message(
         chat_id=update.effective_chat.id,
-        text=f'👋🏼 {sign_language.meps_symbol}\n{tt.choose_book}',
-        reply_markup=InlineKeyboardMarkup(buttons),
+        text=f'👋🏼 {p.language.meps_symbol}\n{tt.choose_book}',
+        reply_markup=keyboards.get((SELECT_BOOK, p.language.code, user.bot_language.code,
+                                    availability.refreshed if availability else None), build),
         parse_mode=HTML,
     )
 
 
 @forw
+@traced('get_book')
 def get_book(update: Update, context: CallbackContext) -> None:
     update.callback_query.answer()
     _, sign_language_code, booknum = update.callback_query.data.split('|')
     p = BiblePassage.from_num(sign_language_code, booknum)
-    show_chapters(update, context, p)
+    show_chapters(update, context, p, get.user(update.effective_user.id))
 
 
-def show_chapters(update: Update, context: CallbackContext, p: BiblePassage) -> None:
-    user = get.user(update.effective_user.id)
+def show_chapters(update: Update, context: CallbackContext, p: BiblePassage, user: User) -> None:
     tt = TextTranslator(user.bot_language.code)
-    if fetch.need_chapter_and_videomarks(p.book):
+    if p.book.refreshed is None:
         update.effective_message.reply_chat_action(ChatAction.TYPING)
         fetch.chapters_and_videomarkers(p.book)
         p.refresh()
-    buttons = list_of_lists(
-        [InlineKeyboardButton(
-            str(chapter.number),
-            callback_data=f'{SELECT_CHAPTER}|{p.language.code}|{p.book.number}|{chapter.number}',
-        ) for chapter in get.chapters(p.book)],
-        columns=8
+    record_demand(p.book)
+    reply_markup = keyboards.get(
+        (SELECT_CHAPTER, p.language.code, p.book.number, p.book.refreshed),
+        lambda: InlineKeyboardMarkup(list_of_lists(
+            [InlineKeyboardButton(
+                str(chapter.number),
+                callback_data=f'{SELECT_CHAPTER}|{p.language.code}|{p.book.number}|{chapter.number}',
+            ) for chapter in get.chapters(p.book)],
+            columns=8
+        ))
     )
-    sign_language = p.language
-    p.set_language(user.bot_language.code)
+    bookname = get.book(user.bot_language.code, p.book.number).name
     kwargs = {
         'chat_id': update.effective_chat.id,
-        'text': f'👋🏼 {sign_language.meps_symbol}\n📖 <b>{p.book.name}</b>\n{tt.choose_chapter}',
-        'reply_markup': InlineKeyboardMarkup(buttons),
+        'text': f'👋🏼 {p.language.meps_symbol}\n📖 <b>{bookname}</b>\n{tt.choose_chapter}',
+        'reply_markup': reply_markup,
         'parse_mode': HTML,
     }
     if update.callback_query:
@@ -226,15 +257,15 @@ def show_chapters(update: Update, context: CallbackContext, p: BiblePassage) ->
         context.bot.send_message(**kwargs)
 
 @forw
+@traced('get_chapter')
 def get_chapter(update: Update, context: CallbackContext) -> None:
     _, sign_language_code, booknum, chapternum = update.callback_query.data.split('|')
     p = BiblePassage.from_num(sign_language_code, booknum, chapternum)
     update.callback_query.answer()
-    show_verses(update, context, p)
+    show_verses(update, context, p, get.user(update.effective_user.id))
 
 
-def show_verses(update: Update, context: CallbackContext, p: BiblePassage) -> None:
-    user = get.user(update.effective_user.id)
+def show_verses(update: Update, context: CallbackContext, p: BiblePassage, user: User) -> None:
     tt = TextTranslator(user.bot_language.code)
     if fetch.need_ffmpeg(p.chapter):
         update.effective_message.reply_chat_action(ChatAction.TYPING)
@@ -242,20 +273,22 @@ def show_verses(update: Update, context: CallbackContext, p: BiblePassage) -> No
         fetch.videomarkers_by_ffmpeg(p.chapter)
         m.delete()
         p.refresh()
-    buttons = list_of_lists(
-        [InlineKeyboardButton(
-            str(video_marker.versenum),
-            callback_data=f'{SELECT_VERSE}|{p.language.code}|{p.book.number}'
-                          f'|{p.chapternumber}|{video_marker.versenum}',
-        ) for video_marker in p.chapter.video_markers],
-        columns=8
+    reply_markup = keyboards.get(
+        (SELECT_VERSE, p.language.code, p.book.number, p.chapternumber, p.chapter.id, p.chapter.checksum),
+        lambda: InlineKeyboardMarkup(list_of_lists(
+            [InlineKeyboardButton(
+                str(video_marker.versenum),
+                callback_data=f'{SELECT_VERSE}|{p.language.code}|{p.book.number}'
+                              f'|{p.chapternumber}|{video_marker.versenum}',
+            ) for video_marker in p.chapter.video_markers],
+            columns=8
+        ))
     )
-    sign_language = p.language
-    p.set_language(user.bot_language.code)
+    bookname = get.book(user.bot_language.code, p.book.number).name
     kwargs = {
         'chat_id': update.effective_chat.id,
-        'text': f'👋🏼 {sign_language.meps_symbol}\n📖 <b>{p.book.name} {p.chapternumber}</b>\n{tt.choose_verse}',
-        'reply_markup': InlineKeyboardMarkup(buttons),
+        'text': f'👋🏼 {p.language.meps_symbol}\n📖 <b>{bookname} {p.chapternumber}</b>\n{tt.choose_verse}',
+        'reply_markup': reply_markup,
         'parse_mode': HTML,
     }
     if update.callback_query:
@@ -267,46 +300,53 @@ def show_verses(update: Update, context: CallbackContext, p: BiblePassage) -> No
 
 
 @forw
+@traced('get_verse')
 def get_verse(update: Update, context: CallbackContext) -> None:
     update.callback_query.answer()
     _, sign_lang_code, booknum, chapternum, verse = update.callback_query.data.split('|')
     p = BiblePassage.from_num(sign_lang_code, booknum, chapternum, verse)
     context.user_data['msg'] = update.callback_query.message
-    manage_verses(update, context, p)
+    manage_verses(update, context, p, get.user(update.effective_user.id))
 
 
-def manage_verses(update: Update, context: CallbackContext, p: BiblePassage) -> None:
+def manage_verses(update: Update, context: CallbackContext, p: BiblePassage, user: User) -> None:
     logger.info('(%s) %s', update.effective_user.name, p.citation)
-    user = get.user(update.effective_user.id)
-    epub = BibleEpub(get.book(user.bot_language.code, p.book.number), p.chapternumber, p.verses)
+    epub = BibleEpub(get.book(user.bot_language.code, p.book.number), p.chapternumber, p.verses,
+                     download=False, unzip=False)
+    if not epub.ready:
+        logger.info('%s epub not ready, queued', epub.language.meps_symbol)
+        jw_epub.queue(epub.language.meps_symbol)
     overlay = user.overlay_language_code if p.book.name != epub.book.name else None
     delogo = bool(user.delogo and overlay)
     if (file := p.chapter.get_file(p.verses, overlay, delogo)):
-        send_by_fileid(update, context, p, epub, file)
+        send_by_fileid(update, context, p, epub, file, user)
     elif len(p.verses) == 1:
-        send_single_verse(update, context, p, epub)
+        send_single_verse(update, context, p, epub, user)
     else:
-        send_concatenate_verses(update, context, p, epub)
+        send_concatenate_verses(update, context, p, epub, user)
 
 
-def send_by_fileid(update: Update, context: CallbackContext, p: BiblePassage, epub: BibleEpub, file: File) -> None:
+def send_by_fileid(update: Update, context: CallbackContext, p: BiblePassage, epub: BibleEpub, file: File,
+                   user: User) -> None:
     if context.user_data.get('msg'):
         context.user_data.get('msg').delete()
     try:
-        msgvideo = context.bot.send_video(
-            chat_id=update.effective_chat.id,
-            video=file.telegram_file_id,
-            caption=(f'<a href="{p.url_share_jw()}">{epub.citation}</a> - '
-                     f'<a href="{p.url_bible_wol_discover}">{p.language.meps_symbol}</a>'),
-            parse_mode=HTML
-        )
-        context.bot.send_chat_action(update.effective_user.id, ChatAction.TYPING)
-        context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text=epub.get_text(),
-            parse_mode=HTML,
-            disable_web_page_preview=True
-        )
+        with span('upload'):
+            msgvideo = context.bot.send_video(
+                chat_id=update.effective_chat.id,
+                video=file.telegram_file_id,
+                caption=(f'<a href="{p.url_share_jw()}">{epub.citation}</a> - '
+                         f'<a href="{p.url_bible_wol_discover}">{p.language.meps_symbol}</a>'),
+                parse_mode=HTML
+            )
+        if epub.ready:
+            context.bot.send_chat_action(update.effective_user.id, ChatAction.TYPING)
+            context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text=epub.get_text(),
+                parse_mode=HTML,
+                disable_web_page_preview=True
+            )
     except TelegramError as e:
         # Nunca ha pasado
         logger.critical('Al parecer se ha eliminado de los servidores de Telegram file_id=%s', file.telegram_file_id)
@@ -315,16 +355,17 @@ def send_by_fileid(update: Update, context: CallbackContext, p: BiblePassage, ep
             text=f'Al parecer se ha eliminado de los servidores de Telegram file_id={file.telegram_file_id}',
             message_thread_id=TOPIC_ERROR,
         )
-        send_single_verse(update, context, p, epub)
+        send_single_verse(update, context, p, epub, user)
         raise e
-    add.file2user(file.id, get.user(update.effective_user.id).id)
-    context.bot.copy_message(LOG_GROUP_ID, update.effective_user.id, msgvideo.message_id,
-                             message_thread_id=TOPIC_USE, disable_notification=True)
+    add.file2user(file.id, user.id)
+    with span('log_copy'):
+        context.bot.copy_message(LOG_GROUP_ID, update.effective_user.id, msgvideo.message_id,
+                                 message_thread_id=TOPIC_USE, disable_notification=True)
 
 
-def send_single_verse(update: Update, context: CallbackContext, p: BiblePassage, epub: BibleEpub) -> None:
+def send_single_verse(update: Update, context: CallbackContext, p: BiblePassage, epub: BibleEpub,
+                      user: User) -> None:
     msg = context.user_data.get('msg')
-    user = get.user(update.effective_user.id)
     tt = TextTranslator(user.bot_language.code)
 
     with_overlay = user.overlay_language_code is not None and p.book.name != epub.book.name
@@ -350,18 +391,19 @@ def send_single_verse(update: Update, context: CallbackContext, p: BiblePassage,
     else:
         filename = f'{safechars(p.citation)} - {p.language.meps_symbol}.mp4'
     streams = video.show_streams(videopath)
-    msgvideo = update.effective_message.reply_video(
-        video=videopath.read_bytes(),
-        filename=filename,
-        caption=(f'<a href="{p.url_share_jw()}">{epub.citation}</a> - '
-                    f'<a href="{p.url_bible_wol_discover}">{p.language.meps_symbol}</a>'),
-        width=streams['width'],
-        height=streams['height'],
-        duration=round(float(streams['duration'])),
-        timeout=120,
-        thumb=thumbnail.read_bytes(),
-        parse_mode=HTML
-    )
+    with span('upload'):
+        msgvideo = update.effective_message.reply_video(
+            video=videopath.read_bytes(),
+            filename=filename,
+            caption=(f'<a href="{p.url_share_jw()}">{epub.citation}</a> - '
+                        f'<a href="{p.url_bible_wol_discover}">{p.language.meps_symbol}</a>'),
+            width=streams['width'],
+            height=streams['height'],
+            duration=round(float(streams['duration'])),
+            timeout=120,
+            thumb=thumbnail.read_bytes(),
+            parse_mode=HTML
+        )
     file = add.file(chapter_id=p.chapter.id,
                     verses=p.verses,
                     telegram_file_id=msgvideo.video.file_id,
@@ -372,21 +414,23 @@ def send_single_verse(update: Update, context: CallbackContext, p: BiblePassage,
                     overlay_language_code=user.overlay_language_code if with_overlay else None,
                     delogo=bool(user.delogo and with_overlay))
     add.file2user(file.id, user.id)
-    update.effective_message.reply_chat_action(ChatAction.TYPING)
-    update.effective_message.reply_text(
-        text=epub.get_text(),
-        parse_mode=HTML,
-        disable_web_page_preview=True,
-    )
+    if epub.ready:
+        update.effective_message.reply_chat_action(ChatAction.TYPING)
+        update.effective_message.reply_text(
+            text=epub.get_text(),
+            parse_mode=HTML,
+            disable_web_page_preview=True,
+        )
     thumbnail.unlink()
-    context.bot.copy_message(LOG_GROUP_ID, update.effective_chat.id, msgvideo.message_id,
-                             message_thread_id=TOPIC_USE, disable_notification=True)
+    with span('log_copy'):
+        context.bot.copy_message(LOG_GROUP_ID, update.effective_chat.id, msgvideo.message_id,
+                                 message_thread_id=TOPIC_USE, disable_notification=True)
     msg.delete()
     videopath.unlink()
 
 
-def send_concatenate_verses(update: Update, context: CallbackContext, p: BiblePassage, epub: BibleEpub) -> None:
-    user = get.user(update.effective_user.id)
+def send_concatenate_verses(update: Update, context: CallbackContext, p: BiblePassage, epub: BibleEpub,
+                            user: User) -> None:
     with_overlay = user.overlay_language_code is not None and p.book.name != epub.book.name
     with_delogo = bool(user.delogo and with_overlay)
     msg = context.user_data.get('msg')
@@ -444,28 +488,31 @@ def send_concatenate_verses(update: Update, context: CallbackContext, p: BiblePa
     thumbnail = video.make_thumbnail(finalpath)
     filename = f'{safechars(p.citation)} - {p.language.meps_symbol}' + \
         (f' ({user.bot_language_code})' if with_overlay else '') + '.mp4'
-    msgvideo = update.effective_message.reply_video(
-        video=finalpath.read_bytes(),
-        filename=filename,
-        caption=(f'<a href="{p.url_share_jw()}">{epub.citation}</a> - '
-                 f'<a href="{p.url_bible_wol_discover}">{p.language.meps_symbol}</a>'),
-        width=stream['width'],
-        height=stream['height'],
-        duration=round(float(stream['duration'])),
-        timeout=120,
-        thumb=thumbnail,
-        parse_mode=HTML
-    )
-    context.bot.send_chat_action(update.effective_user.id, ChatAction.TYPING)
-    update.effective_message.reply_text(
-        text=epub.get_text(),
-        parse_mode=HTML,
-        disable_web_page_preview=True,
-    )
+    with span('upload'):
+        msgvideo = update.effective_message.reply_video(
+            video=finalpath.read_bytes(),
+            filename=filename,
+            caption=(f'<a href="{p.url_share_jw()}">{epub.citation}</a> - '
+                     f'<a href="{p.url_bible_wol_discover}">{p.language.meps_symbol}</a>'),
+            width=stream['width'],
+            height=stream['height'],
+            duration=round(float(stream['duration'])),
+            timeout=120,
+            thumb=thumbnail,
+            parse_mode=HTML
+        )
+    if epub.ready:
+        context.bot.send_chat_action(update.effective_user.id, ChatAction.TYPING)
+        update.effective_message.reply_text(
+            text=epub.get_text(),
+            parse_mode=HTML,
+            disable_web_page_preview=True,
+        )
     thumbnail.unlink()
     msg.delete()
-    context.bot.copy_message(LOG_GROUP_ID, update.effective_chat.id, msgvideo.message_id,
-                             message_thread_id=TOPIC_USE, disable_notification=True)
+    with span('log_copy'):
+        context.bot.copy_message(LOG_GROUP_ID, update.effective_chat.id, msgvideo.message_id,
+                                 message_thread_id=TOPIC_USE, disable_notification=True)
 
     file = add.file(chapter_id=p.chapter.id,
                     verses=p.verses,
@@ -487,21 +534,22 @@ def send_concatenate_verses(update: Update, context: CallbackContext, p: BiblePa
             filename = f'{safechars(p.citation)} - {p.language.meps_symbol} ({user.bot_language_code}).mp4'
         else:
             filename = f'{safechars(p.citation)} - {p.language.meps_symbol}.mp4'
-        msgvideo = context.bot.send_video(
-            chat_id=LOG_GROUP_ID,
-            message_thread_id=TOPIC_BACKUP,
-            video=videopath.read_bytes(),
-            filename=filename,
-            caption=(f'<a href="{p.url_share_jw()}">{epub.citation}</a> - '
-                     f'<a href="{p.url_bible_wol_discover}">{p.language.meps_symbol}</a>'),
-            parse_mode=HTML,
-            width=stream['width'],
-            height=stream['height'],
-            duration=round(float(stream['duration'])),
-            timeout=120,
-            thumb=thumbnail,
-            disable_notification=True
-        )
+        with span('log_backup'):
+            msgvideo = context.bot.send_video(
+                chat_id=LOG_GROUP_ID,
+                message_thread_id=TOPIC_BACKUP,
+                video=videopath.read_bytes(),
+                filename=filename,
+                caption=(f'<a href="{p.url_share_jw()}">{epub.citation}</a> - '
+                         f'<a href="{p.url_bible_wol_discover}">{p.language.meps_symbol}</a>'),
+                parse_mode=HTML,
+                width=stream['width'],
+                height=stream['height'],
+                duration=round(float(stream['duration'])),
+                timeout=120,
+                thumb=thumbnail,
+                disable_notification=True
+            )
         thumbnail.unlink()
         file = add.file(chapter_id=p.chapter.id,
                         verses=p.verses,
@@ -1,3 +1,4 @@
+import time
 from math import ceil
 
 from telegram import Update
@@ -21,10 +22,10 @@ from bot.database import report as rdb
 from bot.database.schema import Language
 from bot.utils import list_of_lists
 from bot.utils.decorators import vip, forw
-from bot.utils.browser import browser
 from bot.secret import ADMIN
 from bot import strings
 from bot.utils import how_to_say
+from bot.utils.user_sessions import user_sessions
 from bot.logs import get_logger
 from bot import MyCommand
 from bot.strings import TextTranslator
@@ -35,6 +36,13 @@ logger = get_logger(__name__)
 SELECT_LANGUAGE = 'SELECT_LANGUAGE'
 PAGE_SIGNLANGUAGE = 'PAGE_SIGNLANGUAGE'
 PAGE_BOTLANGUAGE = 'PAGE_BOTLANGUAGE'
+SIGNLANGS_TTL = 3600 # seconds
+
+_signlangs_menus: dict[str, tuple[float, list[list[dict]]]] = {} # {bot_language_code: (built_at, menu)}
+
+
+def forget_signlangs_menus() -> None:
+    _signlangs_menus.clear()
 
 
 @vip
@@ -57,17 +65,27 @@ def show_current_settings(update: Update, _: CallbackContext) -> None:
 
 def build_signlangs(update: Update, _: CallbackContext):
     user = get.user(update.effective_user.id)
-    res = browser.open(f'https://www.jw.org/{user.bot_language.code}/languages/')
-    return list_of_lists(
+    return signlangs_menu(user.bot_language.code)
+
+
+def signlangs_menu(bot_language_code: str) -> list[list[dict]]:
+    """Sign language buttons said in the bot language. Built from the db once per SIGNLANGS_TTL, unless some
+    name is not in LanguageName yet and the English one is shown instead"""
+    built_at, menu = _signlangs_menus.get(bot_language_code, (0, None))
+    if menu is not None and time.monotonic() - built_at < SIGNLANGS_TTL:
+        return menu
+    names = get.language_names(bot_language_code)
+    sign_languages = sorted(get.sign_languages(), key=lambda x: x.code)
+    menu = list_of_lists(
         [{
-            'text': f'{sign_language["symbol"]} - {sign_language["name"]}',
-            'callback_data': f'{SELECT_LANGUAGE}|{sign_language["symbol"]}' # symbol == language_code
-        } for sign_language in sorted(
-            filter(lambda l: l['isSignLanguage'], res.json()['languages']),
-            key=lambda x: x['symbol'])
-        ],
+            'text': f'{sign_language.code} - {names.get(sign_language.code) or sign_language.name}',
+            'callback_data': f'{SELECT_LANGUAGE}|{sign_language.code}'
+        } for sign_language in sign_languages],
         columns=1
     )
+    if all(sign_language.code in names for sign_language in sign_languages):
+        _signlangs_menus[bot_language_code] = (time.monotonic(), menu)
+    return menu
 
 
 @forw
@@ -83,6 +101,7 @@ def manage_sign_languages(update: Update, context: CallbackContext):
     user.sign_language_code2 = sl[1].code if sl[1] else None
     user.sign_language_code3 = sl[2].code if sl[2] else None
     session.commit()
+    user_sessions.forget(user.telegram_user_id)
 
     tt = TextTranslator(user.bot_language_code)
     update.message.reply_html(
@@ -95,8 +114,9 @@ def manage_sign_languages(update: Update, context: CallbackContext):
 
 
 def show_sign_languages(update: Update, context: CallbackContext):
-    update.effective_message.reply_chat_action(ChatAction.TYPING)
-    fetch.languages()
+    if not get.sign_languages_meps_symbol(): # empty db, refresh_languages job keeps them up to date later
+        update.effective_message.reply_chat_action(ChatAction.TYPING)
+        fetch.languages()
     tt = TextTranslator(get.user(update.effective_user.id).bot_language.code)
     send_buttons(
         message=update.message,
@@ -0,0 +1,172 @@
+"""Background jobs of the bot. They run in the JobQueue thread, so users never wait for them"""
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from datetime import timedelta
+from itertools import chain
+
+from telegram.ext import CallbackContext
+from telegram.ext import JobQueue
+
+from bot import strings
+from bot.database import add
+from bot.database import get
+from bot.database import session
+from bot.database import fetch
+from bot.handlers.settings import forget_signlangs_menus
+from bot.jw import epub
+from bot.logs import get_logger
+from bot.utils import dt_now
+from bot.utils.demand import take_demand
+from bot.utils.demand import requested_book_availability
+from bot.utils.utils import forget_language_names
+from bot.utils.user_sessions import user_sessions
+
+
+logger = get_logger(__name__)
+
+EPUB_WORKERS = 2 # concurrent epub downloads. Each one is tens of MB
+EPUB_REFRESH_INTERVAL = timedelta(days=1)
+EPUB_QUEUE_INTERVAL = timedelta(seconds=15) # cold languages asked by requests
+BOOK_AVAILABILITY_INTERVAL = timedelta(hours=1)
+BOOK_AVAILABILITY_TTL = timedelta(hours=24)
+BOOK_AVAILABILITY_QUEUE_INTERVAL = timedelta(seconds=15) # languages asked by show_books
+LANGUAGES_INTERVAL = timedelta(days=1)
+LANGUAGE_NAMES_INTERVAL = timedelta(days=1)
+CATALOG_INTERVAL = timedelta(minutes=10)
+CATALOG_TTL = timedelta(hours=24)
+CATALOG_BATCH = 20 # books refreshed per run, most requested first
+ACTIVITY_FLUSH_INTERVAL = timedelta(seconds=30)
+
+
+def bot_language_codes() -> list[str]:
+    """Every bot language and every language chosen by users"""
+    return sorted(set(strings.botlangs()) | {user.bot_language_code for user in get.users() if user.bot_language_code})
+
+
+def epub_languages() -> list[str]:
+    """Meps symbols of bot_language_codes"""
+    return sorted({language.meps_symbol for code in bot_language_codes() if (language := get.language(code=code))})
+
+
+def warm_epubs(context: CallbackContext) -> None:
+    """Download, verify and index the epubs. Later runs only download what changed upstream"""
+    refresh = bool(context.job and context.job.context)
+    meps_symbols = epub_languages()
+    logger.info(f'Warming epubs {meps_symbols} {refresh=}')
+    with ThreadPoolExecutor(max_workers=EPUB_WORKERS, thread_name_prefix='epub') as executor:
+        futures = {executor.submit(epub.prepare, meps_symbol, refresh): meps_symbol for meps_symbol in meps_symbols}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                logger.exception(f'{futures[future]} epub could not be prepared')
+    if context.job:
+        context.job.context = True # first run at startup only fills what is missing
+
+
+def warm_queued_epubs(context: CallbackContext) -> None:
+    """Prepare the epubs that requests found missing"""
+    for meps_symbol in epub.queued():
+        try:
+            epub.prepare(meps_symbol)
+        except Exception:
+            logger.exception(f'{meps_symbol} epub could not be prepared')
+
+
+def refresh_book_availability(context: CallbackContext) -> None:
+    """Keep BookAvailability fresh for every sign language chosen by users and every language already stored"""
+    users = get.users()
+    codes = set(chain(
+        (user.sign_language_code for user in users),
+        (user.sign_language_code2 for user in users),
+        (user.sign_language_code3 for user in users),
+        (availability.language_code for availability in get.book_availabilities()),
+    )) - {None}
+    expired = dt_now(naive=True) - BOOK_AVAILABILITY_TTL
+    for code in sorted(codes):
+        availability = get.book_availability(code)
+        if availability and availability.refreshed and availability.refreshed > expired:
+            continue
+        try:
+            fetch.book_availability(code)
+        except Exception:
+            logger.exception(f'Book availability of {code!r} could not be refreshed')
+            session.rollback()
+
+
+def refresh_requested_book_availability(context: CallbackContext) -> None:
+    """BookAvailability of the languages show_books found without it"""
+    for code in requested_book_availability():
+        if get.book_availability(code):
+            continue
+        try:
+            fetch.book_availability(code)
+        except Exception:
+            logger.exception(f'Book availability of {code!r} could not be fetched')
+            session.rollback()
+
+
+def refresh_languages(context: CallbackContext) -> None:
+    """Languages of jw.org, with sign languages for the menu"""
+    try:
+        fetch.languages()
+    except Exception:
+        logger.exception('Languages could not be refreshed')
+        session.rollback()
+    else:
+        forget_signlangs_menus() # new sign languages
+
+
+def refresh_language_names(context: CallbackContext) -> None:
+    """How every language is said in each bot language, for how_to_say"""
+    for code in bot_language_codes():
+        try:
+            fetch.language_names(code)
+        except Exception:
+            logger.exception(f'Language names in {code!r} could not be refreshed')
+            session.rollback()
+        else:
+            forget_language_names(code)
+            forget_signlangs_menus()
+
+
+def refresh_catalog(context: CallbackContext) -> None:
+    """Refresh chapters and video markers of expired books, most requested first. Requests only read the db"""
+    demand = take_demand()
+    books = get.refreshed_books(before=dt_now(naive=True) - CATALOG_TTL)
+    books.sort(key=lambda book: -demand.get((book.edition.language.code, book.number), 0)) # stable, oldest first
+    for book in books[:CATALOG_BATCH]:
+        try:
+            fetch.chapters_and_videomarkers(book, conditional=True)
+        except Exception:
+            logger.exception(f'Catalog of {book.edition.language.code!r} {book.number} could not be refreshed')
+            session.rollback()
+            book.refreshed = dt_now() # retry after CATALOG_TTL, do not block the batch
+            session.commit()
+
+
+def flush_activity(context: CallbackContext) -> None:
+    """Write behind User.last_active_datetime recorded by vip"""
+    if not (activity := user_sessions.drain_activity()):
+        return
+    try:
+        add.last_active(activity)
+    except Exception:
+        logger.exception(f'Activity of {len(activity)} users could not be written')
+        session.rollback()
+
+
+def schedule(job_queue: JobQueue) -> None:
+    job_queue.run_repeating(warm_epubs, interval=EPUB_REFRESH_INTERVAL, first=0, context=False, name='warm_epubs')
+    job_queue.run_repeating(warm_queued_epubs, interval=EPUB_QUEUE_INTERVAL, first=EPUB_QUEUE_INTERVAL,
+                            name='warm_queued_epubs')
+    job_queue.run_repeating(refresh_book_availability, interval=BOOK_AVAILABILITY_INTERVAL, first=30,
+                            name='refresh_book_availability')
+    job_queue.run_repeating(refresh_requested_book_availability, interval=BOOK_AVAILABILITY_QUEUE_INTERVAL,
+                            first=BOOK_AVAILABILITY_QUEUE_INTERVAL, name='refresh_requested_book_availability')
+    job_queue.run_repeating(refresh_languages, interval=LANGUAGES_INTERVAL, first=0, name='refresh_languages')
+    job_queue.run_repeating(refresh_language_names, interval=LANGUAGE_NAMES_INTERVAL, first=5,
+                            name='refresh_language_names')
+    job_queue.run_repeating(refresh_catalog, interval=CATALOG_INTERVAL, first=60, name='refresh_catalog')
+    job_queue.run_repeating(flush_activity, interval=ACTIVITY_FLUSH_INTERVAL, first=ACTIVITY_FLUSH_INTERVAL,
+                            name='flush_activity')
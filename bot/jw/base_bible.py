@@ -20,6 +20,40 @@ logger = get_logger(__name__)
 
 BO = TypeVar('BO', bound='BibleObject')
 
+# ({(booknum, chapternum): {versenum: is_omitted}}, booknums) of the whole Bible table
+_bible_index: tuple[dict[tuple[int, int], dict[int, bool]], frozenset[int]] | None = None
+
+
+def _load_bible_index() -> tuple[dict[tuple[int, int], dict[int, bool]], frozenset[int]]:
+    """Loaded with a single query. Bible table is filled once by start_config.py, so it is safe to keep it in
+    memory. Not kept while empty"""
+    global _bible_index # pylint: disable=global-statement
+    if _bible_index is not None:
+        return _bible_index
+    index = {}
+    for booknum, chapternum, versenum, is_omitted in session.execute(
+            select(Bible.book, Bible.chapter, Bible.verse, Bible.is_omitted)):
+        index.setdefault((booknum, chapternum), {})[versenum] = bool(is_omitted)
+    loaded = (index, frozenset(booknum for booknum, _ in index))
+    if index:
+        _bible_index = loaded
+    return loaded
+
+
+def bible_index() -> dict[tuple[int, int], dict[int, bool]]:
+    """{(booknum, chapternum): {versenum: is_omitted}}"""
+    return _load_bible_index()[0]
+
+
+def bible_booknums() -> frozenset[int]:
+    return _load_bible_index()[1]
+
+
+def forget_bible_index() -> None:
+    """Read the Bible table again on next use"""
+    global _bible_index # pylint: disable=global-statement
+    _bible_index = None
+
 
 class BibleObject:
     BIBLE_PATTERN = r'([123]? *(?:[^\d]+)) *(?:(\d*)[ :]+)? *([ ,\d-]*)'
@@ -73,10 +107,7 @@ class BibleObject:
 
     @chapternumber.setter
     def chapternumber(self, value: int | str | None) -> int | None:
-        if value is not None and select(Bible.id).where(
-                Bible.book == self.book.number,
-                Bible.chapter == int(value)
-            ).scalar() is None:
+        if value is not None and (self.book.number, int(value)) not in bible_index():
             raise exc.ChapterNotExists(self.book.number, self.book.name, int(value))
         if isinstance(value, (str, int)):
             self._chapternumber = int(value)
@@ -121,11 +152,15 @@ class BibleObject:
 
     @property
     def citation(self) -> str:
-        bookname = self.book.name if len(self.verses) > 1 else self.book.standard_singular_bookname
+        return self.citation_of(self.verses)
+
+    def citation_of(self, verses: list[int | None]) -> str:
+        """Citation of the same book and chapter with other verses, without touching self.verses"""
+        bookname = self.book.name if len(verses) > 1 else self.book.standard_singular_bookname
         if self.book.number in [57, 63, 64, 65]:  # Filemón, 2 Juan, 3 Juan, Judas
-            return f'{bookname} {self.get_verse_citation(self.verses)}'
-        if self.chapternumber and self.verses:
-            return f'{bookname} {self.chapternumber}:{self.get_verse_citation(self.verses)}'
+            return f'{bookname} {self.get_verse_citation(verses)}'
+        if self.chapternumber and verses:
+            return f'{bookname} {self.chapternumber}:{self.get_verse_citation(verses)}'
         if self.chapternumber:
             return f'{bookname} {self.chapternumber}'
         else:
@@ -134,9 +169,27 @@ class BibleObject:
 
     @classmethod
     def from_human(cls: Type[BO], citation: str, language_code: str) -> BO:
+        return cls._from_human(citation, language_code, get.books(language_code=language_code))
+
+    @classmethod
+    def from_human_many(cls: Type[BO], citations: list[str], language_code: str) -> list[BO | exc.BaseBibleException]:
+        """Parse several citations at once. Books are queried once for the whole batch and verses are validated
+        against the in-memory bible_index. Each item is the passage or the exception raised by that citation,
+        in the same order as citations"""
+        books = get.books(language_code=language_code)
+        passages = []
+        for citation in citations:
+            try:
+                passages.append(cls._from_human(citation, language_code, books))
+            except exc.BaseBibleException as e:
+                passages.append(e)
+        return passages
+
+    @classmethod
+    def _from_human(cls: Type[BO], citation: str, language_code: str, books: list[Book]) -> BO:
         book_like, chapternumber, verses = cls.parse_citation_regex(citation)
         try:
-            book = cls.search_book(book_like, language_code=language_code)
+            book = cls.search_book(book_like, language_code=language_code, books=books)
         except exc.BookNameNotFound as e:
             if book_like and chapternumber:
                 raise e
@@ -153,7 +206,7 @@ class BibleObject:
             chapternumber = 1
         cls.exists(book.number, chapternumber, verses, book.name)
         if book.edition.language.code != language_code:
-            b = get.book(language_code, book.number)
+            b = next((b for b in books if b.number == book.number), None)
             if b:
                 book = b
             else:
@@ -166,26 +219,19 @@ class BibleObject:
     def exists(booknum: int, chapternumber: int | str | None, verses: int | str | list[int | str] | None,
                bookname:str = None, raise_error:bool = True) -> bool:
         try:
-            s = select(Bible).where(Bible.book == booknum)
-            if not session.query(s.exists()).scalar():
+            if booknum not in bible_booknums():
                 raise exc.BookNumberNotExists(booknum)
+            index = bible_index()
             if chapternumber is None:
                 return True
             chapternumber = int(chapternumber)
-            s = s.where(Bible.chapter == chapternumber)
-            if session.query(s.exists()).scalar() is False:
+            in_chapter = index.get((booknum, chapternumber))
+            if in_chapter is None:
                 raise exc.ChapterNotExists(booknum, bookname, chapternumber)
             if not verses:
                 return True
             verses = BibleObject.get_verses(verses)
-            in_nwt = session.scalars(
-                select(Bible.verse).where(
-                    Bible.book == booknum,
-                    Bible.chapter == chapternumber,
-                    Bible.verse.in_(verses),
-                )
-            ).all()
-            bad = list(set(verses) - set(in_nwt))
+            bad = list(set(verses) - set(in_chapter))
             if bad:
                 raise exc.VerseNotExists(
                     booknum,
@@ -194,16 +240,8 @@ class BibleObject:
                     wrong_verses=BibleObject.get_verse_citation(bad),
                     count_wrong=len(bad)
                 )
-            s = s.where(Bible.verse.in_(verses), Bible.is_omitted  == True)
-            if session.query(s.exists()).scalar():
-                omitted = session.scalars(
-                    select(Bible.verse).where(
-                        Bible.book == booknum,
-                        Bible.chapter == chapternumber,
-                        Bible.verse.in_(verses),
-                        Bible.is_omitted == True
-                    ).order_by(Bible.verse.asc())
-                ).all()
+            omitted = sorted(set(verse for verse in verses if in_chapter[verse]))
+            if omitted:
                 raise exc.VerseOmitted(f'{bookname} {chapternumber}:{BibleObject.get_verse_citation(omitted)}')
         except exc.BaseBibleException as e:
             if raise_error:
@@ -217,10 +255,11 @@ class BibleObject:
     @staticmethod
     def search_book(book_like: str | None = None,
                     language_code: str | None = None,
-                    from_citation: str | None = None) -> Book | None:
+                    from_citation: str | None = None,
+                    books: list[Book] | None = None) -> Book | None:
         book_like = BibleObject.parse_citation_regex(from_citation)[0] if from_citation else book_like
         book_like = re.sub(' *', '', book_like).lower().replace('.', '')
-        books = get.books(language_code=language_code)
+        books = get.books(language_code=language_code) if books is None else books
         for book in books:
             bn, sa, oa, ssb = map(
                 lambda x: re.sub(' *', '', x).lower(),
@@ -316,6 +355,19 @@ class BibleObject:
                 raise exc.BookNotFound
         return cls(book, chapternumber, verses)
 
+    @classmethod
+    def from_chapter(cls: Type[BO], chapter: Chapter, verses: int | str | list[int | str] | None = None) -> BO:
+        """Same as cls(chapter.book, chapter.number, verses) for a chapter already loaded with its book, edition
+        and language. It does not query the db"""
+        obj = cls.__new__(cls)
+        obj._book = chapter.book
+        obj._edition = chapter.book.edition
+        obj._language = chapter.book.edition.language
+        obj._chapter = chapter
+        obj._chapternumber = chapter.number
+        obj.verses = verses
+        return obj
+
 
 if __name__ == '__main__':
     passage = BibleObject.from_human('Mat', 'es')
@@ -1,4 +1,10 @@
+import hashlib
+import json
 import re
+import shutil
+import sqlite3
+import threading
+from functools import lru_cache
 from pathlib import Path
 from zipfile import ZipFile
 
@@ -8,7 +14,9 @@ from bs4 import BeautifulSoup
 from bs4.element import NavigableString, Tag
 
 from bot.jw import BiblePassage
+from bot.logs import get_logger
 from bot.utils.browser import browser
+from bot.utils.tracing import traced
 from bot.database.schema import Book
 
 
@@ -17,6 +25,18 @@ EPUB_PATH.mkdir(exist_ok=True)
 OBSIDIAN = 'Obsidian'
 MARKDOWN = 'Markdown'
 HTML = 'HTML'
+FORMATS = {HTML: 'HTML', MARKDOWN: 'Markdown', OBSIDIAN: 'Obsidian', None: 'Plain'} # format: column in verse store
+VERSENUM = '\x01' # placeholder of verse number in stored verses. Replaced by bold or hyperlink
+NBSP = ' '
+EMSP = '    '
+CHAPTER_CACHE_SIZE = 64 # parsed chapters kept in memory. Users ask adjacent verses in bursts
+UNZIP_MARKER = '.unzipped.json' # {sha256, size, mtime_ns} of the extracted epub
+_locks: dict[str, threading.RLock] = {} # one per language. Warmers never write the same epub at once
+_locks_lock = threading.Lock()
+_queued: set[str] = set() # cold languages asked by requests, prepared by the warmer. Guarded by _locks_lock
+
+logger = get_logger(__name__)
+
 
 class BibleEpub(BiblePassage):
     def __init__(self, book: Book, chapternumber: int | None = None,
@@ -35,39 +55,25 @@ class BibleEpub(BiblePassage):
             raise FileNotFoundError(f'{path.absolute()} not found')
 
     def download(self, overwrite=False):
-        if self.epub_file.exists() and not overwrite:
-            return
-        params = dict(
-            output="json",
-            pub='nwt',
-            fileformat="EPUB",
-            alllangs=0,
-            langwritten=self.language.meps_symbol,
-            txtCMSLang=self.language.meps_symbol,
-            isBible='1'
-        )
-        url = urlunsplit(('https', 'b.jw-cdn.org', '/apis/pub-media/GETPUBMEDIALINKS', urlencode(params), None))
-        r = browser.open(url)
-        print(f'{r.status_code=!r}')
-        assert r.status_code == 200
-
-        url = r.json()['files'][self.language.meps_symbol]['EPUB'][0]['file']['url']
-        with browser.open(url, stream=True) as r:
-            with open(self.epub_file, mode="wb") as f:
-                for chunk in r.iter_content(chunk_size=128*1024):
-                    f.write(chunk)
-        return
+        download(self.language.meps_symbol, overwrite)
 
     def unzip(self):
-        directory_to_extract = Path(self.epub_file).parent / self.epub_file.stem
-        directory_to_extract.mkdir(exist_ok=True)
-        with ZipFile(self.epub_file, 'r') as zip_ref:
-            zip_ref.extractall(directory_to_extract)
+        unzip(self.language.meps_symbol)
+
+    @property
+    def verse_store(self) -> Path:
+        return verse_store(self.language.meps_symbol)
+
+    @property
+    def ready(self) -> bool:
+        """Verses can be read without downloading or extracting anything"""
+        return is_ready(self.language.meps_symbol)
 
     @property
     def epub_file(self) -> Path:
-        return EPUB_PATH / f'nwt_{self.language.meps_symbol}.epub'
+        return epub_file(self.language.meps_symbol)
 
+    @traced('epub_text')
     def get_text(self, fmt=HTML, head_url=True, versenum_url=True) -> str:
         return self.head(fmt, head_url) + '\n' + self.verse_texts(fmt, versenum_url)
 
@@ -82,79 +88,27 @@ class BibleEpub(BiblePassage):
         elif fmt in [MARKDOWN, OBSIDIAN]:
             text = f'[{c}]({url})' if with_url else c
         if fmt == OBSIDIAN:
-            original_verses = self.verses
             text = f'> [!BIBLE]+ {text} '
-            internal_links = []
-            for verse in original_verses:
-                self.verses = verse
-                internal_links.append(f'[[{self.citation}|]]')
-            self.verses = original_verses
-            text += ' '.join(internal_links)
+            text += ' '.join(f'[[{self.citation_of([verse])}|]]' for verse in self.verses)
         return text
 
-    def _get_target_file(self) -> Path:
-        versenav = self.dirpath() / f'OEBPS/bibleversenav{self.book.number}_{self.chapternumber}.xhtml'
-        nav_soup = BeautifulSoup(versenav.read_bytes(), 'html.parser')
+    def verse_texts(self, fmt=None, with_url=False) -> str:
+        verses = [v for v in self.verses if v != 0]
         try:
-            target_file = nav_soup.body.table \
-                .find('a', href=re.compile(f'xhtml#chapter{self.chapternumber}_verse1')) \
-                .get('href').split('#')[0]
-        except AttributeError as e:
-            raise FileNotFoundError from e
-        return (self.dirpath() / 'OEBPS') / target_file
+            fragments, sw = stored_verses(self.verse_store, self.book.number, self.chapternumber, verses, fmt)
+        except LookupError:
+            b = parsed_chapter(self.language.meps_symbol, self.book.number, self.chapternumber)
+            fragments = [verse_fragment(b, self.chapternumber, v, fmt) for v in verses]
+            sw = e.text if (e := b.find('p', class_='sw')) else None
 
-    def verse_texts(self, fmt=None, with_url=False) -> str:
-        # if fmt == None:
-        #     nbsp = ' '
-        #     emsp = '    '
-        # elif fmt in [HTML, 'Markdown', 'Obsidian']:
-        #     nbsp = '&nbsp;'
-        #     emsp = '&emsp;'
-        # elif fmt == 'Markdown':
-        #     nbsp = chr(160)
-        #     ensp = chr(8194)
-        #     emsp = chr(8195)
-        nbsp = ' '
-        emsp = '    '
-        b = BeautifulSoup(self._get_target_file().read_text(encoding='utf-8'), 'html.parser')
+        original_verses = self.verses
         text = ''
-        verses = self.verses
-        for v in filter(lambda x: x != 0, verses):
+        for v, fragment in zip(verses, fragments):
             self.verses = [v]
-            text_number = hyperlink(v, self.url_share_jw(), fmt) if with_url else bold(v, fmt)
-
-            e = b.find('span', id=f'chapter{self.chapternumber}_verse{v}').next
-            while True:
-                if (e is None or
-                (e.name == 'div' and 'groupFootnote' in e.get('class')) or
-                (isinstance(e, Tag) and e.get('id', '').startswith('chapter'))
-                ):
-                    break # while
-
-                if e.name == 'p':
-                    if 'ss' in e.get('class'): # hebrew heading verse, ej: Sal 119:9
-                        e = e.next_sibling
-                        continue # while
-                    text += '\n'
-                    if 'sz' in e.get('class'): # prosa, salmos etc
-                        text += 2*emsp if fmt in [MARKDOWN, OBSIDIAN] and text.endswith('\n') else emsp
-                    elif 'sb' in e.get('class'): # standard paragraph
-                        text += '\n' + emsp
-                    elif 'sl' in e.get('class'): # starting new verse align to left en prosa
-                        text += ''
-                if isinstance(e, NavigableString):
-                    e: NavigableString
-                    try:
-                        int(e)
-                    except ValueError:
-                        text += '' if e in ['\n', '\xa0'] else e.string.replace('\xa0', nbsp).replace('*', '')
-                    else:
-                        # ignore verses <strong><sup>2</sup></strong>
-                        text += text_number
-                e = e.next
-        self.verses = verses
-        if (e := b.find('p', class_='sw')):
-            text = italic(e.text, fmt) + '\n' + text
+            text += fragment.replace(VERSENUM, hyperlink(v, self.url_share_jw(), fmt) if with_url else bold(v, fmt))
+        self.verses = original_verses
+        if sw:
+            text = italic(sw, fmt) + '\n' + text
         if fmt == OBSIDIAN:
             text = '> ' + text.replace('\n', '\n> ')
         elif fmt == None:
@@ -170,6 +124,281 @@ class BibleEpub(BiblePassage):
         text = rstrip(text, [' ', '>', '&emsp;', '\n'])
         return text
 
+
+def epub_file(meps_symbol: str) -> Path:
+    return EPUB_PATH / f'nwt_{meps_symbol}.epub'
+
+
+def verse_store(meps_symbol: str) -> Path:
+    return EPUB_PATH / f'nwt_{meps_symbol}.db'
+
+
+def is_ready(meps_symbol: str) -> bool:
+    return verse_store(meps_symbol).exists() or (EPUB_PATH / f'nwt_{meps_symbol}').is_dir()
+
+
+def queue(meps_symbol: str) -> None:
+    """Ask the warmer for the epub of a cold language. Requests never download it themselves"""
+    with _locks_lock:
+        _queued.add(meps_symbol)
+
+
+def queued() -> list[str]:
+    """Take the queued languages"""
+    with _locks_lock:
+        meps_symbols = sorted(_queued)
+        _queued.clear()
+    return meps_symbols
+
+
+def pubmedia_epub(meps_symbol: str) -> dict:
+    """File entry of the nwt epub in pub-media API. Keys used: url, checksum (md5), modifiedDatetime"""
+    params = dict(
+        output="json",
+        pub='nwt',
+        fileformat="EPUB",
+        alllangs=0,
+        langwritten=meps_symbol,
+        txtCMSLang=meps_symbol,
+        isBible='1'
+    )
+    url = urlunsplit(('https', 'b.jw-cdn.org', '/apis/pub-media/GETPUBMEDIALINKS', urlencode(params), None))
+    r = browser.open(url)
+    logger.info(f'{meps_symbol} pubmedia {r.status_code=!r}')
+    r.raise_for_status()
+    return r.json()['files'][meps_symbol]['EPUB'][0]['file']
+
+
+@traced('epub_download')
+def download(meps_symbol: str, overwrite=False, refresh=False) -> bool:
+    """Download the epub if missing. With refresh=True, download again only when pub-media reports another
+    checksum and the server answers the conditional request (ETag/Last-Modified) with new content.
+    The file is verified against the md5 checksum before replacing the current one. Return True if downloaded
+    """
+    path = epub_file(meps_symbol)
+    sidecar = path.with_suffix('.json') # {url, checksum, etag, last_modified} of the downloaded epub
+    with _lock(meps_symbol):
+        if path.exists() and not overwrite and not refresh:
+            return False
+        try:
+            current = json.loads(sidecar.read_text()) if path.exists() else {}
+        except (FileNotFoundError, ValueError):
+            current = {}
+        file = pubmedia_epub(meps_symbol)
+        if not overwrite and current.get('checksum') and current.get('checksum') == file.get('checksum'):
+            return False
+        headers = {}
+        if not overwrite and current.get('url') == file['url']:
+            if current.get('etag'):
+                headers['If-None-Match'] = current['etag']
+            if current.get('last_modified'):
+                headers['If-Modified-Since'] = current['last_modified']
+
+        tmp = path.with_suffix('.part')
+        md5 = hashlib.md5()
+        with browser.stream(file['url'], headers=headers) as r:
+            if r.status_code == 304:
+                logger.info(f'{meps_symbol} epub not modified')
+                return False
+            r.raise_for_status()
+            with open(tmp, mode="wb") as f:
+                for chunk in r.iter_content(chunk_size=128*1024):
+                    f.write(chunk)
+                    md5.update(chunk)
+            etag, last_modified = r.headers.get('ETag'), r.headers.get('Last-Modified')
+        if file.get('checksum') and md5.hexdigest() != file['checksum']:
+            tmp.unlink(missing_ok=True)
+            raise ValueError(f'{meps_symbol} epub checksum mismatch {md5.hexdigest()} != {file["checksum"]}')
+        tmp.replace(path)
+        sidecar.write_text(json.dumps(dict(url=file['url'], checksum=file.get('checksum') or md5.hexdigest(),
+                                           etag=etag, last_modified=last_modified)))
+        logger.info(f'{meps_symbol} epub downloaded')
+        return True
+
+
+@traced('epub_unzip')
+def unzip(meps_symbol: str) -> None:
+    """Extract the epub only if it changed since last extraction. The new extraction and its verse store are built
+    next to the current ones and swapped in with renames, so requests keep reading the old ones meanwhile
+    """
+    path = epub_file(meps_symbol)
+    directory_to_extract = path.parent / path.stem
+    marker = directory_to_extract / UNZIP_MARKER
+    store = verse_store(meps_symbol)
+    with _lock(meps_symbol):
+        stat = path.stat()
+        try:
+            extracted = json.loads(marker.read_text())
+        except (FileNotFoundError, ValueError):
+            extracted = {}
+        if (extracted.get('size'), extracted.get('mtime_ns')) != (stat.st_size, stat.st_mtime_ns):
+            sha256 = file_sha256(path)
+            if extracted.get('sha256') != sha256:
+                new = directory_to_extract.with_name(directory_to_extract.name + '.new')
+                shutil.rmtree(new, ignore_errors=True)
+                with ZipFile(path, 'r') as zip_ref:
+                    zip_ref.extractall(new)
+                build_verse_store(new, store)
+                swap_directory(new, directory_to_extract)
+                target_file.cache_clear()
+                parsed_chapter.cache_clear()
+            marker.write_text(json.dumps({'sha256': sha256, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}))
+        if not store.exists():
+            build_verse_store(directory_to_extract, store)
+
+
+def prepare(meps_symbol: str, refresh=False) -> None:
+    """Download, verify, extract and index the epub of a language"""
+    download(meps_symbol, refresh=refresh)
+    unzip(meps_symbol)
+
+
+def swap_directory(new: Path, directory: Path) -> None:
+    """Put new in place of directory. Readers of the verse store, already swapped, never notice the gap"""
+    old = directory.with_name(directory.name + '.old')
+    shutil.rmtree(old, ignore_errors=True)
+    if directory.exists():
+        directory.rename(old)
+    new.rename(directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _lock(meps_symbol: str) -> threading.RLock:
+    with _locks_lock:
+        return _locks.setdefault(meps_symbol, threading.RLock())
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024*1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def chapter_file(dirpath: Path, booknum: int, chapternum: int) -> Path:
+    """Chapter xhtml file of an extracted epub, from its versenav"""
+    versenav = dirpath / f'OEBPS/bibleversenav{booknum}_{chapternum}.xhtml'
+    nav_soup = BeautifulSoup(versenav.read_bytes(), 'html.parser')
+    try:
+        target = nav_soup.body.table \
+            .find('a', href=re.compile(f'xhtml#chapter{chapternum}_verse1')) \
+            .get('href').split('#')[0]
+    except AttributeError as e:
+        raise FileNotFoundError from e
+    return (dirpath / 'OEBPS') / target
+
+
+@lru_cache(maxsize=4096)
+def target_file(dirpath: Path, booknum: int, chapternum: int) -> Path:
+    """chapter_file of the extraction in use. Cleared when unzip swaps in a new one"""
+    return chapter_file(dirpath, booknum, chapternum)
+
+
+@lru_cache(maxsize=CHAPTER_CACHE_SIZE)
+def parsed_chapter(meps_symbol: str, booknum: int, chapternum: int) -> BeautifulSoup:
+    """Parsed chapter xhtml. Treat as read-only, it is shared between requests"""
+    path = target_file(EPUB_PATH / f'nwt_{meps_symbol}', booknum, chapternum)
+    return BeautifulSoup(path.read_text(encoding='utf-8'), 'html.parser')
+
+
+def verse_fragment(b: BeautifulSoup, chapternum: int, versenum: int, fmt=None) -> str:
+    """Text of a single verse with VERSENUM where the verse number goes"""
+    # if fmt == None:
+    #     nbsp = ' '
+    #     emsp = '    '
+    # elif fmt in [HTML, 'Markdown', 'Obsidian']:
+    #     nbsp = '&nbsp;'
+    #     emsp = '&emsp;'
+    # elif fmt == 'Markdown':
+    #     nbsp = chr(160)
+    #     ensp = chr(8194)
+    #     emsp = chr(8195)
+    text = ''
+    e = b.find('span', id=f'chapter{chapternum}_verse{versenum}').next
+    while True:
+        if (e is None or
+        (e.name == 'div' and 'groupFootnote' in e.get('class')) or
+        (isinstance(e, Tag) and e.get('id', '').startswith('chapter'))
+        ):
+            break # while
+
+        if e.name == 'p':
+            if 'ss' in e.get('class'): # hebrew heading verse, ej: Sal 119:9
+                e = e.next_sibling
+                continue # while
+            text += '\n'
+            if 'sz' in e.get('class'): # prosa, salmos etc
+                text += 2*EMSP if fmt in [MARKDOWN, OBSIDIAN] and text.endswith('\n') else EMSP
+            elif 'sb' in e.get('class'): # standard paragraph
+                text += '\n' + EMSP
+            elif 'sl' in e.get('class'): # starting new verse align to left en prosa
+                text += ''
+        if isinstance(e, NavigableString):
+            e: NavigableString
+            try:
+                int(e)
+            except ValueError:
+                text += '' if e in ['\n', '\xa0'] else e.string.replace('\xa0', NBSP).replace('*', '')
+            else:
+                # ignore verses <strong><sup>2</sup></strong>
+                text += VERSENUM
+        e = e.next
+    return text
+
+
+@traced('epub_index')
+def build_verse_store(dirpath: Path, store: Path) -> None:
+    """Extract every verse of the epub once, in every format. Then verse_texts is a lookup plus a join"""
+    tmp = store.with_suffix('.tmp')
+    tmp.unlink(missing_ok=True)
+    con = sqlite3.connect(tmp)
+    con.execute('CREATE TABLE Verse (BookNumber INTEGER, ChapterNumber INTEGER, VerseNumber INTEGER, '
+                'HTML VARCHAR, Markdown VARCHAR, Obsidian VARCHAR, Plain VARCHAR, '
+                'PRIMARY KEY (BookNumber, ChapterNumber, VerseNumber)) WITHOUT ROWID')
+    con.execute('CREATE TABLE Chapter (BookNumber INTEGER, ChapterNumber INTEGER, Superscription VARCHAR, '
+                'PRIMARY KEY (BookNumber, ChapterNumber)) WITHOUT ROWID')
+    for versenav in (dirpath / 'OEBPS').glob('bibleversenav*_*.xhtml'):
+        booknum, chapternum = map(int, re.search(r'bibleversenav(\d+)_(\d+)', versenav.stem).groups())
+        try:
+            b = BeautifulSoup(chapter_file(dirpath, booknum, chapternum).read_text(encoding='utf-8'), 'html.parser')
+        except FileNotFoundError:
+            continue
+        versenums = [int(span['id'].split('_verse')[1])
+                     for span in b.find_all('span', id=re.compile(f'^chapter{chapternum}_verse\\d+$'))]
+        con.executemany(
+            'INSERT OR REPLACE INTO Verse VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(booknum, chapternum, v, *(verse_fragment(b, chapternum, v, fmt) for fmt in FORMATS))
+             for v in versenums]
+        )
+        con.execute('INSERT OR REPLACE INTO Chapter VALUES (?, ?, ?)',
+                    (booknum, chapternum, e.text if (e := b.find('p', class_='sw')) else None))
+    con.commit()
+    con.close()
+    tmp.replace(store)
+
+
+def stored_verses(store: Path, booknum: int, chapternum: int, verses: list[int], fmt=None
+                  ) -> tuple[list[str], str | None]:
+    """(verse fragments, superscription) from verse store. Raise LookupError if something is missing"""
+    if not store.exists():
+        raise LookupError(store)
+    con = sqlite3.connect(f'file:{store}?mode=ro', uri=True)
+    try:
+        rows = dict(con.execute(
+            f'SELECT VerseNumber, {FORMATS[fmt]} FROM Verse WHERE BookNumber = ? AND ChapterNumber = ? '
+            f'AND VerseNumber IN ({", ".join("?" * len(verses))})',
+            (booknum, chapternum, *verses)
+        ).fetchall())
+        chapter = con.execute('SELECT Superscription FROM Chapter WHERE BookNumber = ? AND ChapterNumber = ?',
+                              (booknum, chapternum)).fetchone()
+    finally:
+        con.close()
+    if chapter is None or any(v not in rows for v in verses):
+        raise LookupError(booknum, chapternum, verses)
+    return [rows[v] for v in verses], chapter[0]
+
+
 def bold(text: str, fmt=HTML) -> str:
     return f'**{text}**' if fmt in [MARKDOWN, OBSIDIAN] else f'<b>{text}</b>' if fmt == HTML else str(text)
 
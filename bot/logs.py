@@ -1,19 +1,28 @@
+import atexit
 import logging
+import os
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+from logging.handlers import RotatingFileHandler
 from datetime import datetime
+from queue import SimpleQueue
 import pytz
 from pathlib import Path
 
 
-PATH_LOG = Path('./log.log')
+PATH_LOG = Path(os.getenv('LOG_PATH') or './log.log') # env: another file, e.g. the tests'
+MAX_BYTES_LOG = 10 * 1024 * 1024
+BACKUP_COUNT_LOG = 3
+TZ_UTC = pytz.timezone('UTC')
+TZ_LOCAL = pytz.timezone('America/Santiago')
+
 
 class Formatter(logging.Formatter):
     def converter(self, timestamp):
-        dt = datetime.fromtimestamp(timestamp)
-        tzinfo = pytz.timezone('UTC')
-        return tzinfo.localize(dt)
+        return datetime.fromtimestamp(timestamp, tz=TZ_UTC)
 
     def formatTime(self, record, datefmt=None):
-        dt = self.converter(record.created).astimezone(tz=pytz.timezone('America/Santiago'))
+        dt = self.converter(record.created).astimezone(tz=TZ_LOCAL)
         if datefmt:
             s = dt.strftime(datefmt)
         else:
@@ -21,15 +30,30 @@ class Formatter(logging.Formatter):
         return s
 
 
-def get_logger(name, level=logging.INFO) -> logging.Logger:
-    logger = logging.getLogger(name)
-    # console_handler = logging.StreamHandler()
+def _start_listener() -> tuple[QueueHandler, QueueListener]:
+    """One file handler for the whole bot. Loggers only put records in a queue and a single thread
+    formats and writes them to disk"""
     PATH_LOG.touch()
-    console_handler = logging.FileHandler(PATH_LOG)
-    console_handler.setFormatter(
+    file_handler = RotatingFileHandler(PATH_LOG, maxBytes=MAX_BYTES_LOG, backupCount=BACKUP_COUNT_LOG,
+                                       encoding='utf-8')
+    file_handler.setFormatter(
         Formatter('%(asctime)s - %(levelname)s - %(name)s - %(funcName)s - %(message)s')
     )
-    logger.addHandler(console_handler)
+    queue = SimpleQueue()
+    listener = QueueListener(queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return QueueHandler(queue), listener
+
+
+queue_handler, listener = _start_listener()
+
+
+def get_logger(name, level=logging.INFO) -> logging.Logger:
+    logger = logging.getLogger(name)
+    if queue_handler not in logger.handlers:
+        logger.addHandler(queue_handler)
+    logger.propagate = False # every bot logger has its own queue_handler. Avoid duplicates
     logger.setLevel(level)
     return logger
 
@@ -15,6 +15,15 @@ TOPIC_ERROR = int(os.getenv('TOPIC_ERROR', 0))
 TOPIC_WAITING = int(os.getenv('TOPIC_WAITING', 0))
 TOPIC_USE = int(os.getenv('TOPIC_USE', 0))
 URL_FUNCTION = os.getenv('URL_FUNCTION', '')
+HTTP_CACHE_PATH = os.getenv('HTTP_CACHE_PATH') # optional sqlite file, disk tier of the http cache
+HTTP_CACHE_TTL = os.getenv('HTTP_CACHE_TTL') # optional json {url regex: seconds fresh}, replaces the defaults
+WORKERS = int(os.getenv('WORKERS', 8)) # updates processed at once, each user's in order
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '') # public https url of the webhook. Empty: long polling
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8443))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '') # X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))
+WEBHOOK_MAX_PENDING = int(os.getenv('WEBHOOK_MAX_PENDING', 200)) # updates waiting for a worker before answering 503
 
 if TOKEN is None:
     logger.warning('Missing environment variable TOKEN_NWT')
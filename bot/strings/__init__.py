@@ -1,5 +1,6 @@
 from collections.abc import Iterator
 from typing import Protocol
+from types import MappingProxyType
 from pathlib import Path
 from random import choice
 import re
@@ -12,6 +13,87 @@ STRINGS_PATH = Path(__file__).parent / 'strings'
 DEFAULT_LANGUAGE = 'en'
 DEFAULT_PATH = STRINGS_PATH / f'{DEFAULT_LANGUAGE}.yaml'
 yaml = YAML(typ='safe')
+TEMPLATE_PATTERN = r'{[ f.:<>\d]*}'
+VARIABLE_PATTERN = re.compile(r'\${ *([\w.]+) *}')
+
+
+class Template:
+    """String compiled once into literal and lookup segments.
+    'Hi ${language.name}!'  ->  ('Hi ', ('language', 'name'), '!')
+    """
+    __slots__ = ('text', 'segments', 'is_static', 'is_format')
+
+    def __init__(self, text: str):
+        self.text = text
+        parts = VARIABLE_PATTERN.split(text)
+        self.segments = tuple(part if i % 2 == 0 else tuple(part.split('.'))
+                              for i, part in enumerate(parts) if part)
+        self.is_static = all(isinstance(seg, str) for seg in self.segments)
+        self.is_format = bool(re.search(TEMPLATE_PATTERN, VARIABLE_PATTERN.sub('', text)))
+
+    def render(self, obj) -> str:
+        if self.is_static:
+            return self.text
+        return ''.join(seg if isinstance(seg, str) else self.lookup(obj, seg) for seg in self.segments)
+
+    @staticmethod
+    def lookup(obj, path: tuple[str, ...]) -> str:
+        varname, *keys = path
+        value = getattr(obj, varname)
+        for key in keys:
+            value = value.get(key)
+        return value
+
+    def __repr__(self):
+        return f'Template({self.text!r})'
+
+
+def freeze(value):
+    """Read-only copy of plain yaml data, at every level"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    elif isinstance(value, list):
+        return tuple(map(freeze, value))
+    return value
+
+
+def compile_value(value):
+    if isinstance(value, dict):
+        return freeze(value)
+    elif isinstance(value, list):
+        return tuple(map(Template, value))
+    elif isinstance(value, str):
+        return Template(value)
+    return value
+
+
+def is_template(value) -> bool:
+    if isinstance(value, Template):
+        return value.is_format
+    elif isinstance(value, tuple):
+        return any(v.is_format for v in value)
+    return False
+
+
+def load_tables() -> MappingProxyType:
+    """Parse every strings/<lang>.yaml once. Missing strings are filled with the default language.
+    {language_code: {name: (value, is_template)}}"""
+    default = yaml.load(DEFAULT_PATH.read_text())
+    tables = {}
+    for p in STRINGS_PATH.glob('*.yaml'):
+        strings = {k: compile_value(v) for k, v in (default | yaml.load(p.read_text())).items()}
+        tables[p.stem] = MappingProxyType({k: (v, is_template(v)) for k, v in strings.items()})
+    return MappingProxyType(tables)
+
+
+_tables = load_tables()
+
+
+def reload() -> None:
+    """Read again the yaml files. Used by admin command"""
+    global _tables # pylint: disable=global-statement
+    _tables = load_tables()
+
 
 class MyCallable(Protocol):
     def __call__(self, *args: str | int) -> str: ...
@@ -21,42 +103,31 @@ class Self:
         self.name = name # pylint: disable=attribute-defined-outside-init
 
     def __get__(self, obj, type=None) -> str | MyCallable: # pylint: disable=redefined-builtin
-        p = STRINGS_PATH / f'{obj.language_code}.yaml'
-        pt = r'{[ f.:<>\d]*}'
-        try:
-            value = yaml.load(p.read_text())[self.name]
-        except (KeyError, FileNotFoundError):
-            value = yaml.load(DEFAULT_PATH.read_text())[self.name]
-
-        if isinstance(value, str):
-            if re.search(pt, value):
+        table = _tables.get(obj.language_code) or _tables[DEFAULT_LANGUAGE]
+        value, template = table[self.name]
+
+        if isinstance(value, Template):
+            if template:
                 def f(*args: str | int):
-                    return self.custom_format(obj, value.format(*args))
+                    return value.render(obj).format(*args)
             else:
-                return self.custom_format(obj, value)
+                return value.render(obj)
 
-        elif isinstance(value, list):
-            if any([re.search(pt, v) for v in value]):
+        elif isinstance(value, tuple):
+            if template:
                 def f(*args: str | int):
-                    return self.custom_format(obj, choice(value).format(*args))
+                    return choice(value).render(obj).format(*args)
             else:
-                return self.custom_format(obj, choice(value))
+                return choice(value).render(obj)
 
-        elif isinstance(value, dict):
+        elif isinstance(value, MappingProxyType):
             return value
 
         return f
 
     def __set__(self, obj, value) -> None:
         raise AttributeError("Cannot change the value")
-    
-    def custom_format(self, obj, value):
-        pt = r'\${ *([\w.]+) *}'
-        while (m := re.search(pt, value)):
-            varname, *keys = m.group(1).split('.')
-            new = eval(f'obj.{varname}' + ''.join([f'.get("{key}")' for key in keys]))
-            value = re.sub(pt, new, value, 1)
-        return value
+
 
 class TextTranslator:
     language = Self()
@@ -132,6 +203,9 @@ class TextTranslator:
     asking_env = Self()
     success_env = Self()
     restart = Self()
+    strings_reloaded = Self()
+    latency_empty = Self()
+    latency_footer = Self()
 
     def __init__(self, language_code: str) -> None:
         self.language_code = language_code
@@ -150,11 +224,11 @@ def get_admin_commands(botlang) -> list[BotCommand]:
 
 
 def botlangs_vernacular() -> Iterator[tuple[str, str]]:
-    return ((p.stem, yaml.load(p.read_text())['language']['vernacular']) for p in STRINGS_PATH.glob('*.yaml'))
+    return ((code, table['language'][0]['vernacular']) for code, table in _tables.items())
 
 
 def botlangs() -> list[str]:
-    return [yaml.load(p.read_text())['language']['iso_code'] for p in STRINGS_PATH.glob('*.yaml')]
+    return [table['language'][0]['iso_code'] for table in _tables.values()]
 
 
 if __name__ == '__main__':
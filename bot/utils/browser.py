@@ -1,52 +1,134 @@
+import json
 import time
-from datetime import datetime
-from requests.models import Response
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Mapping
 
-import mechanicalsoup
+import bs4
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
 
 from bot.logs import get_logger
 from bot.secret import URL_FUNCTION
+from bot.secret import HTTP_CACHE_PATH
+from bot.secret import HTTP_CACHE_TTL
+from bot.utils.http_cache import HttpCache
 
 logger = get_logger(__name__)
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36'
+TIMEOUT = (10, 60) # connect, read
+POOL_CONNECTIONS = 8 # hosts kept alive: jw.org, wol, b.jw-cdn, pubmedia, akamai...
+POOL_MAXSIZE = 16 # connections per host, one for each concurrent handler
+RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({'GET', 'HEAD'}),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
 
-class LazyBrowser(mechanicalsoup.StatefulBrowser):
-    __slots__ = ['tabs']
-    def __init__(self):
-        self.tabs = {}
-        super().__init__(user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36')
 
-    def open(self, url, *args, timeout=60, **kwargs) -> Response:
-        """translate=True necessary when url hostname is www.jw.org and ip request from AWS servers"""
-        url = URL_FUNCTION + url if 'www.jw.org' in url else url
+@dataclass(frozen=True, slots=True)
+class HttpResponse:
+    """Immutable snapshot of a response. Safe to share between threads"""
+    url: str
+    status_code: int
+    headers: Mapping[str, str] # case insensitive
+    content: bytes
+    encoding: str | None
+    elapsed: float
+
+    @classmethod
+    def from_requests(cls, res: requests.Response) -> 'HttpResponse':
+        return cls(
+            url=res.url,
+            status_code=res.status_code,
+            headers=MappingProxyType(CaseInsensitiveDict(res.headers)),
+            content=res.content,
+            encoding=res.encoding,
+            elapsed=res.elapsed.total_seconds(),
+        )
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    @property
+    def soup(self) -> bs4.BeautifulSoup | None:
+        """New BeautifulSoup of html responses, same as mechanicalsoup did"""
+        if 'text/html' not in self.headers.get('Content-Type', '') and b'<html' not in self.content[:1024].lower():
+            return None
+        http_encoding = self.encoding if 'charset' in self.headers.get('Content-Type', '') else None
+        encoding = http_encoding or bs4.dammit.EncodingDetector.find_declared_encoding(self.content, is_html=True)
+        return bs4.BeautifulSoup(self.content, 'lxml', from_encoding=encoding)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.HTTPError(f'{self.status_code} for url: {self.url}')
+
+
+class HttpClient:
+    """Thread-safe HTTP client. One pool of keep-alive connections per host, timeouts, retries with backoff
+    and an HttpCache in front"""
+    def __init__(self, user_agent=USER_AGENT, timeout=TIMEOUT, retry=RETRY,
+                 pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, cache: HttpCache | None = None):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = user_agent
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.cache = cache or HttpCache()
+
+    @staticmethod
+    def _url(url: str) -> str:
+        """www.jw.org blocks requests from AWS servers, they go through URL_FUNCTION"""
+        return URL_FUNCTION + url if URL_FUNCTION and 'www.jw.org' in url else url
+
+    def _get(self, url: str, headers: Mapping[str, str] | None, timeout) -> HttpResponse:
         logger.info(f'Loading {url}')
-        if url in self.tabs:
-            try:
-                header_expires = self.tabs[url].headers.get('Expires')
-                dt_expires = datetime.strptime(header_expires, "%a, %d %b %Y %H:%M:%S %Z")
-            except:
-                logger.info("Expiration datetime not found. Return cache tab")
-                return self.tabs[url]
-            if header_expires and dt_expires > datetime.now():
-                logger.info(f'Not expired yet {dt_expires.isoformat()}')
-                return self.tabs[url]
-            logger.info('Expired')
-
-        if len(self.tabs) >= 10:
-            old_tab = list(self.tabs)[0]
-            logger.info(f'Closing tab {old_tab}')
-            self.tabs.pop(old_tab)
         t0 = time.time()
-        kwargs = {'timeout': timeout} | kwargs
-        res = super().open(url, *args, **kwargs)
-        logger.info(f'{time.time() - t0:.3f}s')
-        self.tabs |= {url: res}
+        with self.session.get(self._url(url), headers=headers, timeout=timeout or self.timeout) as r:
+            res = HttpResponse.from_requests(r)
+        logger.info(f'{res.status_code} {time.time() - t0:.3f}s')
         return res
 
+    def open(self, url: str, headers: Mapping[str, str] | None = None, timeout=None, cache=True) -> HttpResponse:
+        """GET through the cache. Requests with their own headers (conditional ones) bypass it"""
+        if not cache or headers:
+            return self._get(url, headers, timeout)
+        entry = self.cache.get(url)
+        if entry and entry.is_fresh:
+            self.cache.hit()
+            return entry.response
+        res = self._get(url, entry.validators if entry else None, timeout)
+        if entry and res.status_code == 304:
+            return self.cache.revalidated(url, entry, res)
+        self.cache.miss()
+        self.cache.store(url, res)
+        return res
+
+    def stream(self, url: str, headers: Mapping[str, str] | None = None, timeout=None) -> requests.Response:
+        """Streamed response for big files, never cached. Use it as a context manager and read it with iter_content"""
+        return self.session.get(self._url(url), headers=headers, timeout=timeout or self.timeout, stream=True)
+
 
-browser = LazyBrowser()
+browser = HttpClient(cache=HttpCache(path=Path(HTTP_CACHE_PATH) if HTTP_CACHE_PATH else None,
+                                     ttl_overrides=json.loads(HTTP_CACHE_TTL) if HTTP_CACHE_TTL else None))
 
 if __name__ == '__main__':
     browser.open('https://www.jw.org/en')
     browser.open('https://wol.jw.org/wol/finder?wtlocale=BRS&pub=nwt')
-    print('end')
\ No newline at end of file
+    print('end')
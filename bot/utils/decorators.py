@@ -20,6 +20,7 @@ from bot.database import get, add
 from bot.database.schema import User
 from bot.strings import TextTranslator
 from bot.utils import dt_now
+from bot.utils.user_sessions import user_sessions
 
 
 
@@ -37,7 +38,7 @@ def vip(func: Callable[P, T]) -> Callable[P, T]:
         if not isinstance(tuser, telegram.User):
             return None
         logger.info(f'{update.effective_user.mention_html()}: {update.effective_message.text}')
-        user = get.user(tuser.id)
+        user = user_sessions.get(tuser.id)
         bot_language_code = user.bot_language_code if user else tuser.language_code if get.language(code=tuser.language_code) else 'en'
         tt = TextTranslator(bot_language_code)
         if not user:
@@ -56,17 +57,28 @@ def vip(func: Callable[P, T]) -> Callable[P, T]:
                     [InlineKeyboardButton(f'View {tuser.full_name}', url=f'tg://user?id={tuser.id}')],
                 ])
             )
-
-        user = add.or_update_user(
-            tuser.id,
-            first_name=tuser.first_name,
-            last_name=tuser.last_name,
-            user_name=tuser.username,
-            is_premium=tuser.is_premium,
-            bot_language_code=bot_language_code,
-            status=User.WAITING if not user else user.status,
-            last_active_datetime=dt_now()
-        )
+            add.or_update_user(
+                tuser.id,
+                first_name=tuser.first_name,
+                last_name=tuser.last_name,
+                user_name=tuser.username,
+                is_premium=tuser.is_premium,
+                bot_language_code=bot_language_code,
+                status=User.WAITING,
+                last_active_datetime=dt_now()
+            )
+            user = user_sessions.get(tuser.id)
+        else:
+            if user.profile_changed(tuser):
+                add.or_update_user(
+                    tuser.id,
+                    first_name=tuser.first_name,
+                    last_name=tuser.last_name,
+                    user_name=tuser.username,
+                    is_premium=tuser.is_premium,
+                )
+                user = user_sessions.get(tuser.id)
+            user_sessions.touch(user) # written by jobs.flush_activity
         context.bot.forward_message(
             chat_id=LOG_GROUP_ID,
             message_thread_id=TOPIC_WAITING if not user.is_authorized() else TOPIC_USE,
@@ -78,7 +90,7 @@ def vip(func: Callable[P, T]) -> Callable[P, T]:
             update.effective_message.reply_text(tt.wait)
             return None
 
-        if user.is_authorized() and not user.sign_language:
+        if user.is_authorized() and not user.sign_language_code:
             from bot.handlers.settings import set_language, manage_sign_languages
             if update.message.text.startswith('/'):
                 command = update.message.text[1:]
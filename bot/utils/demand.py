@@ -0,0 +1,41 @@
+"""What users asked for, so the background jobs serve it. Handlers only record it here: jobs.refresh_catalog takes
+the demand of books on each run, most requested first, and jobs.refresh_requested_book_availability fetches the
+book availability that show_books found missing."""
+import threading
+from collections import Counter
+
+from bot.database.schema import Book
+
+
+_demand: Counter[tuple[str, int]] = Counter() # requests by (language code, booknum) since last runs
+_demand_lock = threading.Lock()
+_book_availability: set[str] = set() # language codes without BookAvailability. Guarded by _demand_lock
+
+
+def record_demand(book: Book) -> None:
+    with _demand_lock:
+        _demand[(book.edition.language.code, book.number)] += 1
+
+
+def take_demand() -> dict[tuple[str, int], int]:
+    """Demand so far. What stays is halved, older demand weighs less"""
+    with _demand_lock:
+        demand = dict(_demand)
+        for key in _demand:
+            _demand[key] //= 2
+        for key in [key for key, count in _demand.items() if count <= 0]:
+            del _demand[key]
+    return demand
+
+
+def request_book_availability(language_code: str) -> None:
+    with _demand_lock:
+        _book_availability.add(language_code)
+
+
+def requested_book_availability() -> list[str]:
+    """Take the requested language codes"""
+    with _demand_lock:
+        language_codes = sorted(_book_availability)
+        _book_availability.clear()
+    return language_codes
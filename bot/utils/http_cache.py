@@ -0,0 +1,217 @@
+"""HTTP cache of HttpClient.
+
+Fresh responses are served from memory (LRU bounded by entries and bytes), then from the optional disk tier
+(bounded too, the first to expire go first, and dropped DISK_STALE_TTL after expiring).
+Stale responses with ETag or Last-Modified are revalidated with a conditional request. Responses marked no-store
+or private are never stored. Freshness comes from the ttl overrides of the cache (DEFAULT_TTL_OVERRIDES unless
+given), then Cache-Control, then Expires. Only complete 200 responses of plain GET requests are stored.
+"""
+import email.utils
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from dataclasses import replace
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping
+
+from requests.structures import CaseInsensitiveDict
+
+if TYPE_CHECKING:
+    from bot.utils.browser import HttpResponse
+
+
+MAX_ENTRIES = 512
+MAX_BYTES = 64 * 1024 * 1024
+MAX_DISK_ENTRIES = 4096
+MAX_DISK_BYTES = 256 * 1024 * 1024
+DISK_STALE_TTL = 24 * 3600 # seconds a stale response stays on disk to be revalidated
+DEFAULT_TTL_OVERRIDES = { # url regex: seconds fresh, whatever the server says but no-store
+    r'^https://www\.jw\.org/\w+(-\w+)*/languages/?$': 6 * 3600,
+    r'^https://www\.jw\.org/\w+(-\w+)*/library/bible/json/': 6 * 3600,
+    r'^https://wol\.jw\.org/\w+(-\w+)*/wol/(li|binav)/': 3600,
+    r'^https://wol\.jw\.org/wol/finder\?': 3600,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class CacheEntry:
+    response: 'HttpResponse'
+    expires_at: float # epoch. Stale after it, revalidate if possible
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def validators(self) -> dict[str, str]:
+        headers = self.response.headers
+        return {header: value for header, value in (('If-None-Match', headers.get('ETag')),
+                                                   ('If-Modified-Since', headers.get('Last-Modified')))
+                if value}
+
+
+def freshness(url: str, headers, ttl_overrides: Mapping[str, float] = MappingProxyType({})) -> float | None:
+    """Seconds the response is fresh. None if it must not be stored"""
+    directives = {}
+    for directive in headers.get('Cache-Control', '').lower().split(','):
+        name, _, value = directive.strip().partition('=')
+        directives[name] = value.strip('"')
+    if 'no-store' in directives or 'private' in directives:
+        return None
+    for pattern, ttl in ttl_overrides.items():
+        if re.search(pattern, url):
+            return ttl
+    if 'no-cache' in directives:
+        return 0
+    for name in ('s-maxage', 'max-age'):
+        if directives.get(name, '').isdigit():
+            return int(directives[name])
+    try:
+        expires = email.utils.parsedate_to_datetime(headers['Expires']).timestamp()
+        date = email.utils.parsedate_to_datetime(headers['Date']).timestamp() if 'Date' in headers else time.time()
+    except (KeyError, TypeError, ValueError):
+        return 0
+    return max(expires - date, 0)
+
+
+class HttpCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, path: Path | None = None,
+                 ttl_overrides: Mapping[str, float] | None = None,
+                 max_disk_entries=MAX_DISK_ENTRIES, max_disk_bytes=MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_overrides = MappingProxyType(dict(DEFAULT_TTL_OVERRIDES if ttl_overrides is None else ttl_overrides))
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(path, max_disk_entries, max_disk_bytes) if path else None
+        self._stats = dict(hits=0, misses=0, revalidated=0, stored=0, evicted=0, disk_hits=0)
+
+    def get(self, url: str) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry:
+                self._entries.move_to_end(url)
+        if entry is None and self._disk and (entry := self._disk.get(url)):
+            self._count('disk_hits')
+            self._put(url, entry)
+        return entry
+
+    def hit(self, revalidated=False) -> None:
+        self._count('revalidated' if revalidated else 'hits')
+
+    def miss(self) -> None:
+        self._count('misses')
+
+    def store(self, url: str, response: 'HttpResponse') -> None:
+        ttl = freshness(url, response.headers, self.ttl_overrides)
+        if response.status_code != 200 or ttl is None:
+            return
+        entry = CacheEntry(response, time.time() + ttl)
+        if ttl == 0 and not entry.validators:
+            return # it could not be used again
+        self._count('stored')
+        self._put(url, entry)
+        if self._disk:
+            self._disk.put(url, entry)
+
+    def revalidated(self, url: str, entry: CacheEntry, not_modified: 'HttpResponse') -> 'HttpResponse':
+        """Update cached headers with the 304 ones and extend freshness"""
+        headers = CaseInsensitiveDict(entry.response.headers)
+        headers.update(not_modified.headers)
+        response = replace(entry.response, headers=MappingProxyType(headers))
+        self.store(url, response)
+        self.hit(revalidated=True)
+        return response
+
+    def _put(self, url: str, entry: CacheEntry) -> None:
+        with self._lock:
+            if (old := self._entries.pop(url, None)):
+                self._bytes -= len(old.response.content)
+            self._entries[url] = entry
+            self._bytes += len(entry.response.content)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.response.content)
+                self._stats['evicted'] += 1
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return self._stats | dict(entries=len(self._entries), bytes=self._bytes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._disk:
+            self._disk.clear()
+
+
+class _DiskTier:
+    """Responses kept in a local SQLite file so they survive restarts"""
+    def __init__(self, path: Path, max_entries=MAX_DISK_ENTRIES, max_bytes=MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._con.execute('CREATE TABLE IF NOT EXISTS Response ('
+                              'URL VARCHAR PRIMARY KEY, '
+                              'StatusCode INTEGER NOT NULL, '
+                              'Headers VARCHAR NOT NULL, '
+                              'Content BLOB NOT NULL, '
+                              'Encoding VARCHAR, '
+                              'ExpiresAt FLOAT NOT NULL)')
+            self._con.execute('CREATE INDEX IF NOT EXISTS ResponseExpiresAt ON Response (ExpiresAt)')
+            self._purge()
+            self._con.commit()
+
+    def get(self, url: str) -> CacheEntry | None:
+        from bot.utils.browser import HttpResponse # pylint: disable=import-outside-toplevel
+        with self._lock:
+            row = self._con.execute('SELECT StatusCode, Headers, Content, Encoding, ExpiresAt FROM Response '
+                                    'WHERE URL = ?', (url, )).fetchone()
+        if row is None:
+            return None
+        status_code, headers, content, encoding, expires_at = row
+        response = HttpResponse(url=url, status_code=status_code,
+                                headers=MappingProxyType(CaseInsensitiveDict(json.loads(headers))),
+                                content=content, encoding=encoding, elapsed=0.0)
+        return CacheEntry(response, expires_at)
+
+    def put(self, url: str, entry: CacheEntry) -> None:
+        r = entry.response
+        with self._lock:
+            self._con.execute('INSERT OR REPLACE INTO Response VALUES (?, ?, ?, ?, ?, ?)',
+                              (url, r.status_code, json.dumps(dict(r.headers)), r.content, r.encoding, entry.expires_at))
+            self._purge()
+            self._con.commit()
+
+    def _purge(self) -> None:
+        """Drop responses stale for too long, then the first to expire until within bounds. Under the lock"""
+        self._con.execute('DELETE FROM Response WHERE ExpiresAt < ?', (time.time() - DISK_STALE_TTL, ))
+        count, size = self._con.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(Content)), 0) FROM Response').fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        evicted = []
+        for url, length in self._con.execute('SELECT URL, LENGTH(Content) FROM Response ORDER BY ExpiresAt'):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            evicted.append((url, ))
+            count -= 1
+            size -= length
+        self._con.executemany('DELETE FROM Response WHERE URL = ?', evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._con.execute('DELETE FROM Response')
+            self._con.commit()
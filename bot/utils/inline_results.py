@@ -0,0 +1,103 @@
+"""Inline query answers are rendered once per query key (language, book, chapter, verses) and kept in memory.
+Pages of PAGE_SIZE are answered from the rendered list with next_offset. The empty query lists every file, so it
+is loaded and kept one page at a time with a keyset cursor instead. New and deprecated files call forget(),
+INLINE_RESULTS_TTL covers anything else."""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable
+
+from telegram import InlineQueryResultCachedVideo
+from telegram import ParseMode
+
+from bot.database.schema import File
+from bot.jw import BiblePassage
+
+
+INLINE_CACHE_SIZE = 1024
+INLINE_RESULTS_TTL = 3600 # seconds
+PAGE_SIZE = 50 # most results telegram accepts in one answer
+
+
+@dataclass(frozen=True, slots=True)
+class InlineResult:
+    file_id: int
+    telegram_file_id: str
+    title: str
+    caption: str
+    description: str
+
+    @classmethod
+    def from_file(cls, file: File) -> 'InlineResult':
+        p = BiblePassage.from_chapter(file.chapter, file.raw_verses.split())
+        description = '[OLD] ' if file.is_deprecated else ''
+        description += f'({file.overlay_language.name}) overlay ' if file.overlay_language_code else ''
+        description += 'delogo' if file.delogo else ''
+        return cls(
+            file_id=file.id,
+            telegram_file_id=file.telegram_file_id,
+            title=f'{file.citation} - {p.language.meps_symbol}',
+            caption=f'<a href="{p.url_share_jw()}">{p.citation}</a> - '
+                    f'<a href="{p.url_bible_wol_discover}">{p.language.meps_symbol}</a>',
+            description=description,
+        )
+
+    def to_telegram(self) -> InlineQueryResultCachedVideo:
+        return InlineQueryResultCachedVideo(
+            id=str(self.file_id),
+            video_file_id=self.telegram_file_id,
+            title=self.title,
+            caption=self.caption,
+            description=self.description,
+            parse_mode=ParseMode.HTML
+        )
+
+
+class InlineResultsCache:
+    def __init__(self, maxsize: int = INLINE_CACHE_SIZE, ttl: float = INLINE_RESULTS_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._results: OrderedDict[Hashable, tuple[float, tuple[InlineResult, ...]]] = OrderedDict()
+        self._generation = 0 # bumped by forget(), so a render started before it is not stored
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, load: Callable[[], list[File]]) -> tuple[InlineResult, ...]:
+        with self._lock:
+            built_at, results = self._results.get(key, (0, None))
+            if results is not None and time.monotonic() - built_at < self.ttl:
+                self.hits += 1
+                self._results.move_to_end(key)
+                return results
+            self.misses += 1
+            generation = self._generation
+        results = tuple(map(InlineResult.from_file, load()))
+        with self._lock:
+            if generation == self._generation:
+                self._results[key] = (time.monotonic(), results)
+                while len(self._results) > self.maxsize:
+                    self._results.popitem(last=False)
+        return results
+
+    def forget(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._results.clear()
+
+
+def page(results: tuple[InlineResult, ...], offset: str) -> tuple[list[InlineQueryResultCachedVideo], str]:
+    """Results of the page starting at offset and the next_offset, empty on the last page"""
+    start = int(offset) if offset.isdigit() else 0
+    end = start + PAGE_SIZE
+    return [result.to_telegram() for result in results[start:end]], str(end) if end < len(results) else ''
+
+
+def keyset_page(results: tuple[InlineResult, ...]) -> tuple[list[InlineQueryResultCachedVideo], str]:
+    """Results of a page loaded with get.files(after_file_id=...). next_offset is the last file id"""
+    next_offset = str(results[-1].file_id) if len(results) == PAGE_SIZE else ''
+    return [result.to_telegram() for result in results], next_offset
+
+
+inline_results = InlineResultsCache()
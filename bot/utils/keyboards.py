@@ -0,0 +1,43 @@
+"""Inline keyboards of bible navigation are deterministic for their key, so they are built once and reused.
+Keys include what makes them change (BookAvailability.refreshed, Book.refreshed, Chapter.checksum), so new data
+gets a new key and the stale keyboard ages out of the LRU."""
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from telegram import InlineKeyboardMarkup
+
+
+KEYBOARD_CACHE_SIZE = 2048
+
+
+class KeyboardCache:
+    def __init__(self, maxsize: int = KEYBOARD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._keyboards: OrderedDict[Hashable, InlineKeyboardMarkup] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], InlineKeyboardMarkup]) -> InlineKeyboardMarkup:
+        with self._lock:
+            if key in self._keyboards:
+                self.hits += 1
+                self._keyboards.move_to_end(key)
+                return self._keyboards[key]
+            self.misses += 1
+        keyboard = build()
+        if not keyboard.inline_keyboard or not keyboard.inline_keyboard[0]:
+            return keyboard # empty keyboards are not cached, data may be still fetching
+        with self._lock:
+            self._keyboards[key] = keyboard
+            while len(self._keyboards) > self.maxsize:
+                self._keyboards.popitem(last=False)
+        return keyboard
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keyboards.clear()
+
+
+keyboards = KeyboardCache()
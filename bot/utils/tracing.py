@@ -0,0 +1,132 @@
+"""Per-stage latency of each update.
+
+    with span('upload'):
+        ...
+
+    @traced('split')
+    def split(...):
+        ...
+
+Durations are buffered in memory and written in batches to a local SQLite file next to the bot database,
+created on the first write.
+"""
+import atexit
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+from telegram import Update
+
+from bot.database import PATH_DB
+
+
+PATH_METRICS = PATH_DB.with_name('metrics.db')
+FLUSH_EVERY = 50
+PERCENTILES = (50, 95, 99)
+
+_local = threading.local()
+_lock = threading.Lock()
+_buffer: list[tuple[int | None, str, float, float]] = []
+_con: sqlite3.Connection | None = None # opened by the first flush
+
+
+def _connect() -> sqlite3.Connection:
+    con = sqlite3.connect(PATH_METRICS, check_same_thread=False)
+    con.execute('CREATE TABLE IF NOT EXISTS Span ('
+                'SpanId INTEGER PRIMARY KEY, '
+                'UpdateId INTEGER, '
+                'Stage VARCHAR NOT NULL, '
+                'StartedAt FLOAT NOT NULL, '
+                'Duration FLOAT NOT NULL)')
+    con.execute('CREATE INDEX IF NOT EXISTS IndexSpanStage ON Span (Stage, StartedAt)')
+    return con
+
+
+def _connection() -> sqlite3.Connection:
+    global _con # pylint: disable=global-statement
+    if _con is None:
+        _con = _connect()
+    return _con
+
+
+def current_update_id() -> int | None:
+    return getattr(_local, 'update_id', None)
+
+
+def record(stage: str, started_at: float, duration: float) -> None:
+    with _lock:
+        _buffer.append((current_update_id(), stage, started_at, duration))
+        if len(_buffer) >= FLUSH_EVERY:
+            _flush()
+
+
+def flush() -> None:
+    with _lock:
+        _flush()
+
+
+def _flush() -> None:
+    if not _buffer:
+        return
+    con = _connection()
+    con.executemany('INSERT INTO Span (UpdateId, Stage, StartedAt, Duration) VALUES (?, ?, ?, ?)', _buffer)
+    con.commit()
+    _buffer.clear()
+
+
+atexit.register(flush)
+
+
+@contextmanager
+def span(stage: str):
+    started_at = time.time()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, started_at, time.perf_counter() - t0)
+
+
+@contextmanager
+def bind(update: Update):
+    """Spans inside this block are recorded with update.update_id"""
+    previous = current_update_id()
+    _local.update_id = update.update_id if previous is None else previous
+    try:
+        yield
+    finally:
+        _local.update_id = previous
+
+
+def traced(stage: str):
+    """Decorator. Record the function as a stage. If some argument is an Update, spans inside are tagged
+    with its update_id"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            update = next((arg for arg in args if isinstance(arg, Update)), None)
+            if update is None:
+                with span(stage):
+                    return func(*args, **kwargs)
+            with bind(update), span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def percentiles(hours: int = 24 * 7) -> list[tuple[str, int, float, float, float]]:
+    """[(stage, count, p50, p95, p99), ...] in seconds of the last hours"""
+    flush()
+    with _lock:
+        if _con is None and not PATH_METRICS.exists():
+            return []
+        rows = _connection().execute('SELECT Stage, Duration FROM Span WHERE StartedAt > ? ORDER BY Stage',
+                            (time.time() - hours * 3600, )).fetchall()
+    durations = {}
+    for stage, duration in rows:
+        durations.setdefault(stage, []).append(duration)
+    return [(stage, len(values), *np.percentile(values, PERCENTILES))
+            for stage, values in durations.items()]
@@ -0,0 +1,96 @@
+"""What vip needs to know about a user, kept in memory so most messages do not touch the db.
+
+Snapshots are dropped by forget() whenever add.or_update_user or a handler changes the user. Activity is written
+behind: touch() only records the time and jobs.flush_activity writes every pending timestamp in one batch."""
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+import telegram
+
+from bot.database import get
+from bot.database.schema import User
+from bot.utils import dt_now
+
+
+@dataclass(frozen=True, slots=True)
+class UserSession:
+    id: int
+    telegram_user_id: int
+    status: int
+    bot_language_code: str | None
+    sign_language_code: str | None
+    overlay_language_code: str | None
+    delogo: bool
+    first_name: str | None
+    last_name: str | None
+    user_name: str | None
+    is_premium: bool | None
+
+    @classmethod
+    def from_user(cls, user: User) -> 'UserSession':
+        return cls(
+            id=user.id,
+            telegram_user_id=user.telegram_user_id,
+            status=user.status,
+            bot_language_code=user.bot_language_code,
+            sign_language_code=user.sign_language_code,
+            overlay_language_code=user.overlay_language_code,
+            delogo=user.delogo,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            user_name=user.user_name,
+            is_premium=user.is_premium,
+        )
+
+    def is_authorized(self) -> bool:
+        return self.status == User.AUTHORIZED
+
+    def profile_changed(self, tuser: telegram.User) -> bool:
+        """Whether add.or_update_user would write something new of the telegram profile"""
+        return bool(
+            (tuser.first_name and tuser.first_name != self.first_name) or
+            (tuser.last_name is not None and tuser.last_name != self.last_name) or
+            (tuser.username and tuser.username != self.user_name) or
+            (tuser.is_premium is not None and tuser.is_premium != self.is_premium)
+        )
+
+
+class UserSessions:
+    def __init__(self):
+        self._sessions: dict[int, UserSession] = {}
+        self._activity: dict[int, datetime] = {} # {User.id: last active} not written yet
+        self._lock = threading.Lock()
+
+    def get(self, telegram_user_id: int) -> UserSession | None:
+        with self._lock:
+            if (user_session := self._sessions.get(telegram_user_id)):
+                return user_session
+        if (user := get.user(telegram_user_id)) is None:
+            return None # not cached, the user may be added any time
+        user_session = UserSession.from_user(user)
+        with self._lock:
+            self._sessions[telegram_user_id] = user_session
+        return user_session
+
+    def forget(self, telegram_user_id: int) -> None:
+        with self._lock:
+            self._sessions.pop(telegram_user_id, None)
+
+    def clear(self) -> None:
+        """Forget every session and the activity not written yet. After the database is replaced"""
+        with self._lock:
+            self._sessions.clear()
+            self._activity.clear()
+
+    def touch(self, user_session: UserSession) -> None:
+        with self._lock:
+            self._activity[user_session.id] = dt_now()
+
+    def drain_activity(self) -> dict[int, datetime]:
+        with self._lock:
+            activity, self._activity = self._activity, {}
+        return activity
+
+
+user_sessions = UserSessions()
@@ -4,7 +4,6 @@ from datetime import datetime
 import pytz
 
 from bot.database import get
-from bot.utils.browser import browser
 from bot.logs import get_logger
 
 
@@ -43,11 +42,25 @@ def dt_now(naive: bool = False) -> datetime:
 def now() -> str:
     return dt_now().isoformat(sep=' ', timespec="seconds")
 
+_language_names: dict[str, dict[str, str]] = {} # {in_language_code: {language_code: name}}
+
+
 def how_to_say(this_language_code: str, in_this_language_code: str) -> str:
-    try:
-        data = browser.open(f'https://www.jw.org/{in_this_language_code}/languages').json()
-        return list(filter(lambda x: x['symbol'] == this_language_code, data['languages']))[0]['name']
-    except:
-        logger.warning(f"Can't get how to say this language {this_language_code!r} "
-                       f"in this language {in_this_language_code!r}")
-        return get.language(code=this_language_code).name
+    """Name of a language in another language. Names are read from LanguageName once per language"""
+    if not (names := _language_names.get(in_this_language_code)):
+        names = get.language_names(in_this_language_code)
+        if names: # empty until refresh_language_names fetches them, so read again next time
+            _language_names[in_this_language_code] = names
+    if (name := names.get(this_language_code)):
+        return name
+    logger.warning(f"Can't get how to say this language {this_language_code!r} "
+                   f"in this language {in_this_language_code!r}")
+    return get.language(code=this_language_code).name
+
+
+def forget_language_names(in_language_code: str | None = None) -> None:
+    """Read LanguageName again on next how_to_say"""
+    if in_language_code is None:
+        _language_names.clear()
+    else:
+        _language_names.pop(in_language_code, None)
@@ -10,11 +10,13 @@ from PIL import Image
 from bot.logs import get_logger
 from bot.utils import safechars
 from bot.utils.fonts import select_font
+from bot.utils.tracing import traced
 from bot.database.schema import VideoMarker
 
 
 logger = get_logger(__name__)
 
+@traced('split')
 def split(marker: VideoMarker, overlay_text: str = None, script: str = None, with_delogo: bool = False) -> Path:
     if not script:
         script = 'ROMAN'
@@ -62,6 +64,7 @@ def split(marker: VideoMarker, overlay_text: str = None, script: str = None, wit
     return output
 
 
+@traced('ffprobe')
 def show_streams(video) -> dict[str, str | int]:
     console = run(
         shlex.split(f'ffprobe -v quiet -show_streams -print_format json -i "{video}"'),
@@ -72,6 +75,7 @@ def show_streams(video) -> dict[str, str | int]:
     return streams[0]
 
 
+@traced('concatenate')
 def concatenate(inputvideos: list[Path], outname: str=None, title_chapters: list[str]=None, title:str=None) -> Path:
     assert len(inputvideos) == len(title_chapters)
     output = Path((outname or ' - '.join([Path(i).stem for i in inputvideos])) + '.mp4')
@@ -122,6 +126,7 @@ def parse_time(stamptime) -> float:
         hours, minutes, seconds = stamptime.split(':')
         return int(hours)*60*60 + int(minutes)*60 + float(seconds)
 
+@traced('thumbnail')
 def make_thumbnail(inputvideo: Path, name=None) -> Path:
     thumb = inputvideo.parent / ((name or inputvideo.stem) + '.jpg')
     run(
@@ -0,0 +1,90 @@
+"""Webhook ingestion, the alternative to long polling when WEBHOOK_URL is set.
+
+Telegram POSTs each update to WEBHOOK_URL, a reverse proxy forwards it to WEBHOOK_LISTEN:WEBHOOK_PORT and the
+update goes straight to the KeyedDispatcher, without the update queue. A body may also be a JSON array of updates
+(batches of a proxy or of benchmarks/fake_telegram.py), accepted or refused as a whole.
+
+When more than WEBHOOK_MAX_PENDING updates are running or waiting for a worker the server answers 503 with
+Retry-After, and Telegram delivers the update again later instead of piling it up in memory."""
+import json
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import TYPE_CHECKING
+
+from telegram import Update
+
+from bot.logs import get_logger
+
+if TYPE_CHECKING:
+    from bot.dispatcher import KeyedDispatcher
+
+
+logger = get_logger(__name__)
+
+MAX_BODY = 8 * 1024 * 1024
+RETRY_AFTER = 1 # seconds
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], dispatcher: 'KeyedDispatcher', path: str = '/',
+                 secret_token: str | None = None, max_pending: int = 200):
+        super().__init__(address, WebhookHandler)
+        self.dispatcher = dispatcher
+        self.path = path
+        self.secret_token = secret_token
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self.stats = dict(accepted=0, refused=0)
+
+    def accept(self, updates: list[dict]) -> bool:
+        """Hand the updates to the dispatcher. False if workers are too busy to take them"""
+        with self._lock:
+            if self.dispatcher.executor.pending() + len(updates) > self.max_pending:
+                self.stats['refused'] += len(updates)
+                return False
+            for data in updates:
+                self.dispatcher.process_update(Update.de_json(data, self.dispatcher.bot))
+            self.stats['accepted'] += len(updates)
+        return True
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    server: WebhookServer
+    protocol_version = 'HTTP/1.1' # keep-alive, telegram reuses up to max_connections
+
+    def do_POST(self) -> None:
+        if self.path != self.server.path:
+            self._reply(HTTPStatus.NOT_FOUND)
+            return
+        if self.server.secret_token and \
+                self.headers.get('X-Telegram-Bot-Api-Secret-Token') != self.server.secret_token:
+            self._reply(HTTPStatus.FORBIDDEN)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            self._reply(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+            return
+        try:
+            data = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._reply(HTTPStatus.BAD_REQUEST)
+            return
+        updates = data if isinstance(data, list) else [data]
+        if not self.server.accept(updates):
+            self._reply(HTTPStatus.SERVICE_UNAVAILABLE, {'Retry-After': str(RETRY_AFTER)})
+            return
+        self._reply(HTTPStatus.OK)
+
+    def _reply(self, status: HTTPStatus, headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None: # pylint: disable=redefined-builtin
+        logger.debug(format, *args)
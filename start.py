@@ -21,22 +21,36 @@ main_func(1, 2)
 [-] Multilenguaje descripción
 """
 
-from telegram.ext import Updater
 from bot.secret import TOKEN, ADMIN
+from bot.secret import WEBHOOK_URL
+from bot.secret import WEBHOOK_LISTEN
+from bot.secret import WEBHOOK_PORT
+from bot.secret import WEBHOOK_SECRET
+from bot.secret import WEBHOOK_MAX_CONNECTIONS
+from bot.secret import WEBHOOK_MAX_PENDING
+from bot.dispatcher import build_updater
 from bot.logs import get_logger
 from bot.handlers import handlers, error_handler
+from bot.jobs import schedule
+from bot.jobs import flush_activity
 
 
 logger = get_logger(__name__)
 
 
 if __name__ == '__main__':
-    updater = Updater(TOKEN)
+    updater = build_updater(TOKEN)
     for handler in handlers:
         updater.dispatcher.add_handler(handler)
     updater.dispatcher.add_error_handler(error_handler)
-    updater.start_polling()
+    schedule(updater.job_queue)
+    if WEBHOOK_URL:
+        updater.start_webhook_server(WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_URL, WEBHOOK_SECRET,
+                                     max_connections=WEBHOOK_MAX_CONNECTIONS, max_pending=WEBHOOK_MAX_PENDING)
+    else:
+        updater.start_polling()
     updater.bot.send_message(
         chat_id=ADMIN, text='Bot is running 🤖'
     )
     updater.idle()
+    flush_activity(None) # activity recorded since the last run of the job
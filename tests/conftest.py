@@ -0,0 +1,13 @@
+"""Loaded before the test modules import bot, so its files go to a throwaway directory and not to the tree"""
+import atexit
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+
+TMP = Path(tempfile.mkdtemp(prefix='nwt-tests-'))
+atexit.register(shutil.rmtree, TMP, ignore_errors=True)
+os.environ['DATABASE_PATH'] = str(TMP / 'database.db')
+os.environ['LOG_PATH'] = str(TMP / 'log.log')
+os.chdir(TMP) # bible-epub and the other paths relative to the working directory
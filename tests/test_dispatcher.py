@@ -0,0 +1,64 @@
+import threading
+import time
+
+from bot.dispatcher import KeyedExecutor
+
+
+def test_same_key_runs_in_submission_order():
+    executor = KeyedExecutor(max_workers=4)
+    done = {key: [] for key in 'abc'}
+
+    def task(key: str, i: int):
+        time.sleep(0.001 * (i % 3)) # uneven tasks, a later one must not overtake
+        done[key].append(i)
+
+    for i in range(30):
+        for key in done:
+            executor.submit(key, task, key, i)
+    executor.shutdown()
+    assert done == {key: list(range(30)) for key in done}
+    assert executor.pending() == 0
+
+
+def test_same_key_never_runs_twice_at_once():
+    executor = KeyedExecutor(max_workers=4)
+    lock = threading.Lock()
+    running, most = 0, 0
+
+    def task():
+        nonlocal running, most
+        with lock:
+            running += 1
+            most = max(most, running)
+        time.sleep(0.002)
+        with lock:
+            running -= 1
+
+    for _ in range(20):
+        executor.submit('user', task)
+    executor.shutdown()
+    assert most == 1
+
+
+def test_different_keys_run_at_once():
+    executor = KeyedExecutor(max_workers=2)
+    barrier = threading.Barrier(2, timeout=5)
+    met = []
+    for key in ('a', 'b'):
+        executor.submit(key, lambda: met.append(barrier.wait() is not None)) # breaks if a waits for b
+    executor.shutdown()
+    assert met == [True, True]
+
+
+def test_failed_task_does_not_stop_its_key():
+    executor = KeyedExecutor(max_workers=1)
+    done = []
+
+    def fail():
+        raise ValueError
+
+    executor.submit('user', fail)
+    executor.submit('user', done.append, 'next')
+    executor.shutdown()
+    assert done == ['next']
+    assert executor.pending() == 0
@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import create_engine
+
+from bot.database import get
+from bot.database import session
+from bot.database.schema import Base
+from bot.database.schema import Book
+from bot.database.schema import Chapter
+from bot.database.schema import Edition
+from bot.database.schema import File
+from bot.database.schema import Language
+
+
+FILES = [ # (sign language, booknum, chapternum, raw verses), inserted out of order
+    ('ase', 43, 3, '16'),
+    ('ase', 19, 23, '1 2 3'),
+    ('ase', 19, 23, '1'),
+    ('ase', 43, 1, '1'),
+    ('ase', 19, 23, '1'), # same keys as the one above, only the id tells them apart
+    ('bzs', 19, 23, '1'),
+    ('ase', 19, 100, '4'),
+    ('ase', 19, 23, '10'), # '10' < '2' as text
+    ('ase', 19, 23, '2'),
+]
+
+
+@pytest.fixture
+def files(tmp_path) -> list[File]:
+    """Files of FILES in a throwaway database, in the order get.files must return them"""
+    bind = session.session_factory.kw['bind']
+    engine = create_engine(f'sqlite:///{tmp_path / "database.db"}')
+    Base.metadata.create_all(engine)
+    session.remove()
+    session.configure(bind=engine)
+    chapters = {}
+    for n, (code, booknum, chapternum, raw_verses) in enumerate(FILES):
+        if (code, booknum, chapternum) not in chapters:
+            if not (language := session.get(Language, code)):
+                language = Language(code=code, meps_symbol=code.upper(), is_sign_language=True)
+                session.add(Edition(language=language, symbol='nwt'))
+            edition = language.edition[0]
+            book = next((b for b in edition.books if b.number == booknum), None) or \
+                Book(edition=edition, number=booknum)
+            chapters[(code, booknum, chapternum)] = Chapter(book=book, number=chapternum)
+        session.add(File(chapter=chapters[(code, booknum, chapternum)], raw_verses=raw_verses,
+                         telegram_file_id=f'file{n}', telegram_file_unique_id=f'unique{n}'))
+    session.commit()
+    yield sorted(session.query(File).all(),
+                 key=lambda f: (f.chapter.book.number, f.chapter.number, f.raw_verses, f.id))
+    session.remove()
+    session.configure(bind=bind)
+    engine.dispose()
+
+
+def ids(files: list[File]) -> list[int]:
+    return [file.id for file in files]
+
+
+def test_order_without_cursor(files):
+    ase = [f for f in files if f.chapter.book.edition.language_code == 'ase']
+    assert ids(get.files('ase')) == ids(ase)
+    assert ids(get.files()) == ids(files)
+
+
+@pytest.mark.parametrize('limit', range(1, len(FILES) + 2))
+def test_pages_cover_everything_once(files, limit):
+    seen, after = [], None
+    while (page := get.files(limit=limit, after_file_id=after)):
+        assert len(page) <= limit
+        seen += ids(page)
+        after = page[-1].id
+    assert seen == ids(files)
+
+
+def test_cursor_between_equal_keys(files):
+    first, second = [f for f in files if f.chapter.book.edition.language_code == 'ase'
+                     and (f.chapter.book.number, f.chapter.number, f.raw_verses) == (19, 23, '1')]
+    assert get.files('ase', limit=1, after_file_id=first.id)[0].id == second.id
+
+
+def test_cursor_at_the_end(files):
+    assert get.files(after_file_id=files[-1].id) == []
+    assert get.files(limit=5, after_file_id=files[-1].id) == []
+
+
+def test_unknown_cursor(files):
+    assert get.files(after_file_id=max(ids(files)) + 1) == []
+
+
+def test_cursor_of_a_filtered_out_file(files):
+    bzs = next(f for f in files if f.chapter.book.edition.language_code == 'bzs')
+    after = files[files.index(bzs) + 1:]
+    assert ids(get.files('ase', after_file_id=bzs.id)) == \
+        [f.id for f in after if f.chapter.book.edition.language_code == 'ase']
@@ -0,0 +1,128 @@
+import email.utils
+import time
+from dataclasses import replace
+from types import MappingProxyType
+
+from requests.structures import CaseInsensitiveDict
+
+from bot.utils.browser import HttpResponse
+from bot.utils.http_cache import DISK_STALE_TTL
+from bot.utils.http_cache import CacheEntry
+from bot.utils.http_cache import HttpCache
+from bot.utils.http_cache import freshness
+
+
+URL = 'https://b.jw-cdn.org/apis/pub-media/GETPUBMEDIALINKS?pub=nwt'
+OVERRIDDEN = 'https://wol.jw.org/wol/finder?wtlocale=E'
+
+
+def response(url=URL, status_code=200, **headers) -> HttpResponse:
+    headers = {name.replace('_', '-'): value for name, value in headers.items()}
+    return HttpResponse(url=url, status_code=status_code, headers=MappingProxyType(CaseInsensitiveDict(headers)),
+                        content=b'{}', encoding='utf-8', elapsed=0.0)
+
+
+def test_max_age():
+    assert freshness(URL, {'Cache-Control': 'public, max-age=600'}) == 600
+    assert freshness(URL, {'Cache-Control': 'max-age=600, s-maxage=60'}) == 60
+
+
+def test_no_cache_is_stale_at_once():
+    assert freshness(URL, {'Cache-Control': 'no-cache, max-age=600'}) == 0
+
+
+def test_expires_relative_to_date():
+    now = time.time()
+    headers = {'Date': email.utils.formatdate(now, usegmt=True),
+               'Expires': email.utils.formatdate(now + 300, usegmt=True)}
+    assert freshness(URL, headers) == 300
+    assert freshness(URL, {'Expires': 'not a date'}) == 0
+    assert freshness(URL, {}) == 0
+
+
+def test_no_store_and_private_are_never_stored():
+    for cache_control in ('no-store', 'private', 'private, max-age=600', 'NO-STORE'):
+        assert freshness(URL, {'Cache-Control': cache_control}) is None
+
+
+def test_override_wins_over_max_age_but_not_over_no_store():
+    overrides = {r'^https://wol\.jw\.org/wol/finder\?': 3600}
+    assert freshness(OVERRIDDEN, {'Cache-Control': 'max-age=5'}, overrides) == 3600
+    assert freshness(OVERRIDDEN, {'Cache-Control': 'no-cache'}, overrides) == 3600
+    assert freshness(OVERRIDDEN, {'Cache-Control': 'no-store'}, overrides) is None
+    assert freshness(URL, {'Cache-Control': 'max-age=5'}, overrides) == 5
+
+
+def test_overrides_are_configurable():
+    assert HttpCache().ttl_overrides # defaults
+    assert not HttpCache(ttl_overrides={}).ttl_overrides
+    cache = HttpCache(ttl_overrides={r'pub-media': 60})
+    assert freshness(URL, {}, cache.ttl_overrides) == 60
+
+
+def test_store_skips_no_store():
+    cache = HttpCache(ttl_overrides={})
+    cache.store(URL, response(cache_control='no-store, max-age=600'))
+    assert cache.get(URL) is None
+    assert cache.stats()['stored'] == 0
+
+
+def test_store_skips_what_cannot_be_used_again():
+    cache = HttpCache(ttl_overrides={})
+    cache.store(URL, response(cache_control='no-cache'))
+    cache.store(URL, response(status_code=404, cache_control='max-age=600'))
+    assert cache.get(URL) is None
+
+
+def test_fresh_and_stale_entries():
+    cache = HttpCache(ttl_overrides={})
+    cache.store(URL, response(cache_control='max-age=600'))
+    assert cache.get(URL).is_fresh
+    cache.store(URL, response(cache_control='no-cache', etag='"v1"'))
+    entry = cache.get(URL)
+    assert not entry.is_fresh
+    assert entry.validators == {'If-None-Match': '"v1"'}
+
+
+def test_revalidated_extends_freshness():
+    cache = HttpCache(ttl_overrides={})
+    stale = CacheEntry(response(etag='"v1"', last_modified='Mon, 19 Oct 2026 00:00:00 GMT'), time.time() - 1)
+    refreshed = cache.revalidated(URL, stale, response(status_code=304, cache_control='max-age=600'))
+    assert refreshed.status_code == 200
+    assert refreshed.headers['ETag'] == '"v1"'
+    assert cache.get(URL).is_fresh
+    assert cache.stats()['revalidated'] == 1
+
+
+def stored_on_disk(path, urls: list[str]) -> list[str]:
+    disk = HttpCache(path=path, ttl_overrides={})
+    return [url for url in urls if disk.get(url)]
+
+
+def test_disk_tier_keeps_max_entries(tmp_path):
+    cache = HttpCache(path=tmp_path / 'http.db', ttl_overrides={}, max_disk_entries=3)
+    urls = [f'{URL}&n={n}' for n in range(5)]
+    for url, max_age in zip(urls, (600, 60, 6000, 300, 3000)): # the first to expire go first
+        cache.store(url, response(cache_control=f'max-age={max_age}'))
+    assert stored_on_disk(tmp_path / 'http.db', urls) == [urls[0], urls[2], urls[4]]
+
+
+def test_disk_tier_keeps_max_bytes(tmp_path):
+    cache = HttpCache(path=tmp_path / 'http.db', ttl_overrides={}, max_disk_bytes=1024)
+    small = [f'{URL}&n={n}' for n in range(3)]
+    for n, url in enumerate(small):
+        cache.store(url, response(cache_control=f'max-age={600 + n}')) # 2 bytes each
+    big = replace(response(cache_control='max-age=6000'), content=b'x' * 1021)
+    cache.store(f'{URL}&big', big)
+    assert stored_on_disk(tmp_path / 'http.db', small + [f'{URL}&big']) == [small[2], f'{URL}&big']
+
+
+def test_disk_tier_drops_long_stale_responses(tmp_path):
+    cache = HttpCache(path=tmp_path / 'http.db', ttl_overrides={})
+    stale = CacheEntry(response(etag='"v1"'), time.time() - DISK_STALE_TTL - 1)
+    recent = CacheEntry(response(etag='"v2"'), time.time() - 1)
+    cache._disk.put(f'{URL}&stale', stale) # pylint: disable=protected-access
+    cache._disk.put(f'{URL}&recent', recent) # pylint: disable=protected-access
+    disk = HttpCache(path=tmp_path / 'http.db', ttl_overrides={})
+    assert disk.get(f'{URL}&stale') is None
+    assert disk.get(f'{URL}&recent').validators == {'If-None-Match': '"v2"'}
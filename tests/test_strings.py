@@ -0,0 +1,107 @@
+import random
+import re
+from functools import cache
+from types import MappingProxyType
+
+import pytest
+
+from bot import strings
+from bot.strings import Template
+from bot.strings import TextTranslator
+from bot.strings import freeze
+
+
+ARGS = (3, 'Génesis', 7, 'ASL', 1.5, 2, 'x', 4, 5, 6) # more than any string asks, format ignores the rest
+
+
+def legacy_format(obj, value: str) -> str:
+    """custom_format of the str.format path that Template replaced"""
+    pt = r'\${ *([\w.]+) *}'
+    while (m := re.search(pt, value)):
+        varname, *keys = m.group(1).split('.')
+        new = getattr(obj, varname)
+        for key in keys:
+            new = new.get(key)
+        value = re.sub(pt, new, value, 1)
+    return value
+
+
+@cache
+def yaml_table(language_code: str) -> dict:
+    path = strings.STRINGS_PATH / f'{language_code}.yaml'
+    return strings.yaml.load(strings.DEFAULT_PATH.read_text()) | strings.yaml.load(path.read_text())
+
+
+def legacy_get(obj, name: str):
+    """What Self.__get__ returned before Template, from the plain yaml"""
+    value = yaml_table(obj.language_code)[name]
+    pt = strings.TEMPLATE_PATTERN
+    if isinstance(value, str):
+        if re.search(pt, value):
+            return lambda *args: legacy_format(obj, value.format(*args))
+        return legacy_format(obj, value)
+    elif isinstance(value, list):
+        if any(re.search(pt, v) for v in value):
+            return lambda *args: legacy_format(obj, random.choice(value).format(*args))
+        return legacy_format(obj, random.choice(value))
+    return value
+
+
+class Speaker:
+    language_code = 'en'
+    language = {'name': 'English', 'code': 'en'}
+    bot = {'name': 'nwt'}
+
+
+def names() -> list[str]:
+    return [name for name, attr in vars(TextTranslator).items() if isinstance(attr, strings.Self)]
+
+
+@pytest.mark.parametrize('language_code', strings.botlangs())
+def test_every_string_renders_as_before(language_code):
+    tt = TextTranslator(language_code)
+
+    def same_choice(name: str, get):
+        random.seed(name) # lists pick one of their strings when read or called
+        return get()
+
+    for name in names():
+        legacy = same_choice(name, lambda: legacy_get(tt, name))
+        value = same_choice(name, lambda: getattr(tt, name))
+        if callable(legacy):
+            assert same_choice(name, lambda: value(*ARGS)) == same_choice(name, lambda: legacy(*ARGS)), name
+        else:
+            assert value == legacy, name
+
+
+@pytest.mark.parametrize('text', [
+    'plain text',
+    'Hi ${language.name}!',
+    '${ language.name } and ${language.code}, ${bot.name}',
+    '<b>{}</b> of {}',
+    '{:>5} verses, {:<8} s',
+    '{0} and {1} and {0}',
+    '$ sign {}',
+    '',
+])
+def test_template_matches_str_format_path(text):
+    obj = Speaker()
+    template = Template(text)
+    expected = legacy_format(obj, text.format(*ARGS)) if template.is_format else legacy_format(obj, text)
+    rendered = template.render(obj)
+    assert (rendered.format(*ARGS) if template.is_format else rendered) == expected
+
+
+def test_static_template_keeps_text():
+    template = Template('no variables here {}')
+    assert template.is_static
+    assert template.render(None) == 'no variables here {}'
+
+
+def test_tables_are_read_only_at_every_level():
+    frozen = freeze({'a': {'b': [1, {'c': 2}]}})
+    assert isinstance(frozen, MappingProxyType)
+    assert isinstance(frozen['a'], MappingProxyType)
+    assert frozen['a']['b'] == (1, MappingProxyType({'c': 2}))
+    with pytest.raises(TypeError):
+        frozen['a']['b'][1]['c'] = 3